@@ -1,10 +1,28 @@
 # from . import engines
 # from . import verses
-from . import breads
-from . import chapters
-from . import complex_meters
-from . import comprovisation
-from . import globals_
-from . import transcriptions
-from . import trackmaker
-from . import versemaker
+
+import importlib
+
+# submodules are only imported when they are accessed for the first time (PEP 562),
+# so that small entry points don't have to import abjad, pyo, etc.
+__all__ = (
+    "breads",
+    "chapters",
+    "complex_meters",
+    "comprovisation",
+    "globals_",
+    "transcriptions",
+    "trackmaker",
+    "versemaker",
+)
+
+
+def __getattr__(name: str):
+    if name in __all__:
+        return importlib.import_module("{}.{}".format(__name__, name))
+
+    raise AttributeError("module '{}' has no attribute '{}'".format(__name__, name))
+
+
+def __dir__() -> list:
+    return sorted(set(globals()).union(__all__))
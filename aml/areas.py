@@ -8,6 +8,7 @@ from mu.utils import infit
 
 from aml import complex_meters
 from aml import globals_
+from aml import pitch_registry
 
 
 class Area(object):
@@ -37,7 +38,7 @@ class Area(object):
 
         else:
             self._instrument = globals_.INSTRUMENT_NAME2ADAPTED_INSTRUMENT[
-                globals_.PITCH2INSTRUMENT[self.pitch.normalize()]
+                pitch_registry.REGISTRY.get_instrument(self.pitch)
             ]
 
             # only split events if the complete duration of the event is bigger than one
@@ -90,10 +91,11 @@ class Area(object):
         start_positions_of_mandatory_events = tuple(
             ev.delay for ev in self.absolute_events
         )
+        # positions are compared with a set: building a tick grid for the few positions
+        # of one area is slower than comparing the fractions directly
+        mandatory_positions = frozenset(start_positions_of_mandatory_events)
         absolute_events_to_choose_from = tuple(
-            rm
-            for rm in rhythm_metricity_pairs
-            if rm[0] not in start_positions_of_mandatory_events
+            rm for rm in rhythm_metricity_pairs if rm[0] not in mandatory_positions
         )
         choosen_events = sorted(
             absolute_events_to_choose_from, key=operator.itemgetter(1)
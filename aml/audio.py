@@ -0,0 +1,121 @@
+"""Lightweight reading of wave files.
+
+Wave files are accessed through a memory map, so that only the parts that are actually
+needed get loaded. With a decimation factor > 1 the (mono) signal gets averaged over
+blocks of 'decimation' frames, which is good enough for analysis tasks like tempo
+estimation and reduces the amount of data that has to be analysed.
+"""
+
+import struct
+
+import numpy as np
+
+
+_WAVE_FORMAT_PCM = 1
+_WAVE_FORMAT_IEEE_FLOAT = 3
+_WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+# how many frames get converted to float at once
+_BLOCK_SIZE = 1 << 18
+
+
+def read_wav_info(sf_path: str) -> dict:
+    """Return format information of a wave file by only reading its chunk headers."""
+    with open(sf_path, "rb") as f:
+        riff, _, wave = struct.unpack("<4sI4s", f.read(12))
+        if riff != b"RIFF" or wave != b"WAVE":
+            raise ValueError("{} isn't a wave file.".format(sf_path))
+
+        info = None
+        while True:
+            header = f.read(8)
+            if len(header) < 8:
+                raise ValueError("{} doesn't contain any data chunk.".format(sf_path))
+
+            chunk_id, chunk_size = struct.unpack("<4sI", header)
+            if chunk_id == b"fmt ":
+                fmt = f.read(chunk_size)
+                format_tag, n_channels, sample_rate, byte_rate = struct.unpack(
+                    "<HHII", fmt[:12]
+                )
+                block_align, bits_per_sample = struct.unpack("<HH", fmt[12:16])
+                if format_tag == _WAVE_FORMAT_EXTENSIBLE:
+                    format_tag = struct.unpack("<H", fmt[24:26])[0]
+                info = {
+                    "format_tag": format_tag,
+                    "n_channels": n_channels,
+                    "sample_rate": sample_rate,
+                    "byte_rate": byte_rate,
+                    "block_align": block_align,
+                    "bits_per_sample": bits_per_sample,
+                }
+                f.seek(chunk_size % 2, 1)
+            elif chunk_id == b"data":
+                if info is None:
+                    raise ValueError("{} has no fmt chunk.".format(sf_path))
+                info.update(
+                    {
+                        "data_offset": f.tell(),
+                        "data_size": chunk_size,
+                        "n_frames": chunk_size // info["block_align"],
+                    }
+                )
+                return info
+            else:
+                f.seek(chunk_size + (chunk_size % 2), 1)
+
+
+def _convert2float(frames: np.ndarray, info: dict) -> np.ndarray:
+    """Convert raw frames (one row of bytes per frame) to floats between -1 and 1."""
+    bytes_per_sample = info["bits_per_sample"] // 8
+    samples = frames.reshape(-1, info["n_channels"], bytes_per_sample)
+
+    if info["format_tag"] == _WAVE_FORMAT_IEEE_FLOAT:
+        dtype = "<f{}".format(bytes_per_sample)
+        return np.ascontiguousarray(samples).view(dtype)[..., 0].astype(np.float32)
+
+    if info["format_tag"] != _WAVE_FORMAT_PCM:
+        raise NotImplementedError(
+            "Unsupported wave format: {}.".format(info["format_tag"])
+        )
+
+    if bytes_per_sample == 1:
+        return (samples[..., 0].astype(np.float32) - 128) / 128
+
+    # left align all samples in 32 bit integers to support 24 bit files
+    as_int32 = np.zeros(samples.shape[:2] + (4,), dtype=np.uint8)
+    as_int32[..., 4 - bytes_per_sample :] = samples
+    return as_int32.view("<i4")[..., 0].astype(np.float32) / (1 << 31)
+
+
+def load_wav(sf_path: str, decimation: int = 1) -> tuple:
+    """Return (mono_signal, sample_rate) - pair of a wave file.
+
+    The file gets memory - mapped and is converted blockwise, so that the complete
+    file never has to be loaded into memory at once. If 'decimation' is bigger than 1,
+    each block of 'decimation' frames gets averaged to one sample and the returned
+    sample rate is divided accordingly.
+    """
+    if decimation < 1:
+        raise ValueError("Decimation has to be at least 1.")
+
+    info = read_wav_info(sf_path)
+    n_frames = (info["n_frames"] // decimation) * decimation
+    frames = np.memmap(
+        sf_path,
+        dtype=np.uint8,
+        mode="r",
+        offset=info["data_offset"],
+        shape=(info["n_frames"], info["block_align"]),
+    )
+
+    block_size = max(1, _BLOCK_SIZE // decimation) * decimation
+    signal = np.empty(n_frames // decimation, dtype=np.float32)
+    for start in range(0, n_frames, block_size):
+        stop = min(start + block_size, n_frames)
+        block = _convert2float(frames[start:stop], info).mean(axis=1)
+        signal[start // decimation : stop // decimation] = block.reshape(
+            -1, decimation
+        ).mean(axis=1)
+
+    return signal, info["sample_rate"] / decimation
@@ -0,0 +1 @@
+"""Benchmarks for the build tools of aml."""
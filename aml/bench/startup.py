@@ -0,0 +1,173 @@
+"""Measure import time and peak memory usage of aml modules.
+
+Each module is imported in isolation in fresh subprocesses. The first run of each
+module is reported separately as cold start (it may have to fill caches or compile
+byte code), the median of the remaining runs is compared against a stored baseline.
+
+Usage (from the root of the repository):
+
+    python -m aml.bench.startup [--runs N] [--tolerance T] [--save-baseline]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+MODULES = (
+    "aml.globals_",
+    "aml.transcriptions",
+    "aml.complex_meters",
+    "aml.trackmaker.keyboard",
+    "aml.trackmaker.strings",
+    "aml.versemaker",
+    "aml.electronics.midi",
+)
+
+REPORT_PATH = "aml/build/bench/startup.json"
+BASELINE_PATH = "aml/bench/startup_baseline.json"
+
+_MEASURE_SCRIPT = """
+import importlib, json, resource, time
+start = time.perf_counter()
+importlib.import_module({!r})
+import_time = time.perf_counter() - start
+peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({{"import_time": import_time, "peak_rss": peak_rss}}))
+"""
+
+
+def measure_import(module: str) -> dict:
+    """Import module in a fresh interpreter and return time (s) & peak RSS (kB)."""
+    start = time.perf_counter()
+    process = subprocess.run(
+        (sys.executable, "-c", _MEASURE_SCRIPT.format(module)),
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+    )
+    wall_time = time.perf_counter() - start
+    if process.returncode != 0:
+        msg = "Importing {} failed:\n{}".format(module, process.stderr)
+        raise RuntimeError(msg)
+
+    result = json.loads(process.stdout.strip().splitlines()[-1])
+    result.update({"wall_time": wall_time})
+    return result
+
+
+def measure_modules(modules: tuple = MODULES, n_runs: int = 5) -> dict:
+    report = {}
+    for module in modules:
+        try:
+            runs = tuple(measure_import(module) for _ in range(n_runs))
+        except RuntimeError as error:
+            report.update({module: {"error": str(error)}})
+            continue
+
+        warm_runs = runs[1:] if n_runs > 1 else runs
+        report.update(
+            {
+                module: {
+                    "cold": runs[0],
+                    "warm": {
+                        key: statistics.median(run[key] for run in warm_runs)
+                        for key in runs[0]
+                    },
+                }
+            }
+        )
+    return report
+
+
+def compare_with_baseline(report: dict, baseline: dict, tolerance: float) -> tuple:
+    """Return messages for every warm value that exceeds baseline * (1 + tolerance)."""
+    regressions = []
+    for module, data in report.items():
+        try:
+            baseline_data = baseline[module]["warm"]
+            warm_data = data["warm"]
+        except KeyError:
+            continue
+
+        for key in ("wall_time", "import_time", "peak_rss"):
+            limit = baseline_data[key] * (1 + tolerance)
+            if warm_data[key] > limit:
+                regressions.append(
+                    "{}: {} {:.3f} > {:.3f} (baseline {:.3f})".format(
+                        module, key, warm_data[key], limit, baseline_data[key]
+                    )
+                )
+    return tuple(regressions)
+
+
+def _write_json(path: str, data: dict) -> None:
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    with open(path, "w") as f:
+        json.dump(data, f, indent=4, sort_keys=True)
+
+
+def main(args: tuple = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("modules", nargs="*", default=MODULES)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--report", default=REPORT_PATH)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument(
+        "--save-baseline",
+        action="store_true",
+        help="store the measured values as the new baseline",
+    )
+    args = parser.parse_args(args)
+
+    report = measure_modules(tuple(args.modules), args.runs)
+    _write_json(args.report, report)
+
+    for module, data in report.items():
+        if "error" in data:
+            print("{:<28} failed to import".format(module))
+        else:
+            print(
+                "{:<28} cold {:7.3f}s  warm {:7.3f}s  peak rss {:9.0f} kB".format(
+                    module,
+                    data["cold"]["wall_time"],
+                    data["warm"]["wall_time"],
+                    data["warm"]["peak_rss"],
+                )
+            )
+
+    if args.save_baseline:
+        _write_json(args.baseline, report)
+        return 0
+
+    try:
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+    except FileNotFoundError:
+        # without a baseline no regression could ever be detected
+        print(
+            "No baseline found in {}, create one with --save-baseline.".format(
+                args.baseline
+            )
+        )
+        return 1
+
+    regressions = compare_with_baseline(report, baseline, args.tolerance)
+    for regression in regressions:
+        print("REGRESSION {}".format(regression))
+
+    if any("error" in data for data in report.values()):
+        return 1
+
+    return int(bool(regressions))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
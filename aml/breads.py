@@ -9,6 +9,7 @@ from mu.rhy import indispensability
 from mu.utils import tools
 
 from aml import globals_
+from aml import ticks
 
 
 class Slice(object):
@@ -170,6 +171,10 @@ class Bread(object):
         )
         positions = tools.accumulate_from_zero(positions)[:-1]
 
+        if ticks.is_enabled():
+            tick_grid = ticks.TickGrid.from_values(positions)
+            tick_positions = tick_grid.to_ticks_tuple(positions)
+
         slices = []
 
         for tone in adapted_melody.convert2absolute():
@@ -186,11 +191,22 @@ class Bread(object):
                 center = dev_range + tone.delay
                 actual_dev = dev_range * maximum_deviation_from_center
                 dev0, dev1 = center - actual_dev, center + actual_dev
-                available_split_positions = tuple(
-                    (pos, met)
-                    for pos, met in zip(positions, metricities)
-                    if pos > dev0 and pos < dev1
-                )
+                if ticks.is_enabled():
+                    start_idx, stop_idx = tick_grid.find_index_range_between(
+                        tick_positions, dev0, dev1
+                    )
+                    available_split_positions = tuple(
+                        zip(
+                            positions[start_idx:stop_idx],
+                            metricities[start_idx:stop_idx],
+                        )
+                    )
+                else:
+                    available_split_positions = tuple(
+                        (pos, met)
+                        for pos, met in zip(positions, metricities)
+                        if pos > dev0 and pos < dev1
+                    )
 
                 # (2) choose the one with the highest metricity
                 split_position = max(
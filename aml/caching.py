@@ -0,0 +1,294 @@
+"""Helper functions for persistent caches of derived data.
+
+Every cached file is keyed by a content hash of everything it has been derived from,
+so that it gets rebuilt automatically as soon as one of its sources changes.
+
+Caches with many entries (like the transcription cache) use a DirectoryCache. Its
+entries can be checked and cleaned up from the command line:
+
+    python -m aml.caching {verify,gc} [--directory DIRECTORY] [--max-size BYTES]
+"""
+
+import argparse
+import contextlib
+import hashlib
+import os
+import pickle
+import sys
+import tempfile
+
+try:
+    import fcntl
+except ImportError:
+    # file locking is only available on unix systems
+    fcntl = None
+
+
+def hash_files(*paths: str) -> str:
+    """Return hex digest of the names and the content of all passed files."""
+    hasher = hashlib.sha256()
+    for path in paths:
+        hasher.update(path.encode())
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 16), b""):
+                hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def hash_file_content(path: str) -> str:
+    """Return hex digest of the content of a file (independent from its name)."""
+    hasher = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def hash_data(*items) -> str:
+    """Return hex digest of the representation of all passed items."""
+    return hashlib.sha256(repr(items).encode()).hexdigest()
+
+
+def atomic_write(path: str, data: bytes) -> None:
+    """Write data to a temporary file first and rename it afterwards.
+
+    Concurrent readers will therefore either see the old or the new file, but never a
+    partially written file.
+    """
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp_")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def load_or_build(path: str, key: str, build) -> object:
+    """Return cached data for key or call build and save its result in path.
+
+    A cache file that can't be written (e.g. because of a read-only installation)
+    doesn't raise an error: the data will just be rebuilt during the next call.
+    """
+    try:
+        with open(path, "rb") as f:
+            stored_key, data = pickle.load(f)
+    except Exception:
+        stored_key = None
+
+    if stored_key == key:
+        return data
+
+    data = build()
+    try:
+        atomic_write(path, pickle.dumps((key, data), protocol=pickle.HIGHEST_PROTOCOL))
+    except OSError:
+        pass
+
+    return data
+
+
+def write_if_changed(path: str, data: bytes) -> bool:
+    """Atomically write data to path unless the file already has the same content.
+
+    Return True if the file has been written.
+    """
+    try:
+        with open(path, "rb") as f:
+            is_unchanged = (
+                hashlib.sha256(f.read()).digest() == hashlib.sha256(data).digest()
+            )
+    except OSError:
+        is_unchanged = False
+
+    if is_unchanged:
+        return False
+
+    atomic_write(path, data)
+    return True
+
+
+class DirectoryCache(object):
+    """Persistent cache that saves each entry in its own file.
+
+    Entries are named by their key (which should be a hash of all inputs), so that
+    different processes can share the same directory: files are written atomically
+    and writes, evictions and cleanups are serialised by a lock file. Reading an entry
+    updates its modification time. If the summed size of all entries exceeds
+    'max_size', the least recently used entries get removed.
+    """
+
+    _suffix = ".pickle"
+    _lock_name = ".lock"
+
+    def __init__(self, directory: str, max_size: int = 1 << 30):
+        self.directory = directory
+        self.max_size = max_size
+
+    def __repr__(self) -> str:
+        return "DirectoryCache({})".format(self.directory)
+
+    def _get_path(self, key: str) -> str:
+        return "{}/{}{}".format(self.directory, key, self._suffix)
+
+    @contextlib.contextmanager
+    def _lock(self):
+        os.makedirs(self.directory, exist_ok=True)
+        with open("{}/{}".format(self.directory, self._lock_name), "a") as lock_file:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    @staticmethod
+    def _read_entry(path: str) -> tuple:
+        """Return (key, payload) of an entry file. Raise ValueError if it's corrupt."""
+        try:
+            with open(path, "rb") as f:
+                key, digest, payload = pickle.load(f)
+        except (pickle.UnpicklingError, EOFError, TypeError, ValueError) as error:
+            raise ValueError("Corrupt cache entry {}: {}".format(path, error))
+
+        if hashlib.sha256(payload).hexdigest() != digest:
+            raise ValueError("Corrupt cache entry {}: wrong checksum".format(path))
+
+        return key, payload
+
+    def __contains__(self, key: str) -> bool:
+        return os.path.isfile(self._get_path(key))
+
+    def get(self, key: str) -> object:
+        """Return cached data. Raise KeyError for missing or corrupt entries."""
+        path = self._get_path(key)
+        try:
+            stored_key, payload = self._read_entry(path)
+            if stored_key != key:
+                raise ValueError("Cache entry {} has wrong key".format(path))
+            data = pickle.loads(payload)
+        except FileNotFoundError:
+            raise KeyError(key)
+        except Exception:
+            with contextlib.suppress(OSError):
+                os.remove(path)
+            raise KeyError(key)
+
+        # mark entry as recently used
+        with contextlib.suppress(OSError):
+            os.utime(path)
+
+        return data
+
+    def put(self, key: str, data: object) -> None:
+        payload = pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL)
+        entry = pickle.dumps(
+            (key, hashlib.sha256(payload).hexdigest(), payload),
+            protocol=pickle.HIGHEST_PROTOCOL,
+        )
+        with self._lock():
+            atomic_write(self._get_path(key), entry)
+            self._evict()
+
+    def load_or_build(self, key: str, build) -> object:
+        """Return cached data for key or call build and save its result.
+
+        Like the 'load_or_build' function, data that can't be saved (because it can't
+        be pickled or because the directory isn't writable) is returned anyway.
+        """
+        try:
+            return self.get(key)
+        except KeyError:
+            data = build()
+            try:
+                self.put(key, data)
+            except (pickle.PicklingError, TypeError, AttributeError, OSError):
+                pass
+            return data
+
+    def _get_entries(self) -> list:
+        """Return (modification_time, size, path) - triple for each entry."""
+        entries = []
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return entries
+
+        for name in names:
+            if name.endswith(self._suffix) and not name.startswith("."):
+                path = "{}/{}".format(self.directory, name)
+                with contextlib.suppress(FileNotFoundError):
+                    stat = os.stat(path)
+                    entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def _evict(self) -> tuple:
+        """Remove least recently used entries until the cache fits into max_size."""
+        entries = sorted(self._get_entries())
+        size = sum(entry[1] for entry in entries)
+        removed = []
+        for _, entry_size, path in entries:
+            if size <= self.max_size:
+                break
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(path)
+            size -= entry_size
+            removed.append(path)
+        return tuple(removed)
+
+    def verify(self) -> tuple:
+        """Remove corrupt entries and return their paths."""
+        removed = []
+        with self._lock():
+            for _, _, path in self._get_entries():
+                name = os.path.basename(path)[: -len(self._suffix)]
+                try:
+                    stored_key, _ = self._read_entry(path)
+                    if stored_key != name:
+                        raise ValueError
+                except ValueError:
+                    os.remove(path)
+                    removed.append(path)
+        return tuple(removed)
+
+    def gc(self) -> tuple:
+        """Remove leftover temporary files and evict entries and return their paths."""
+        removed = []
+        with self._lock():
+            for name in os.listdir(self.directory):
+                if name.startswith(".tmp_"):
+                    path = "{}/{}".format(self.directory, name)
+                    with contextlib.suppress(FileNotFoundError):
+                        os.remove(path)
+                    removed.append(path)
+            removed.extend(self._evict())
+        return tuple(removed)
+
+
+def main(args: tuple = None) -> int:
+    # globals_ uses this module, therefore it can't be imported at module level
+    from aml import globals_
+
+    parser = argparse.ArgumentParser(description="Check and clean up a cache.")
+    parser.add_argument("command", choices=("verify", "gc"))
+    parser.add_argument("--directory", default=globals_.TRANSCRIPTION_CACHE_PATH)
+    parser.add_argument(
+        "--max-size", type=int, default=globals_.TRANSCRIPTION_CACHE_MAX_SIZE
+    )
+    args = parser.parse_args(args)
+
+    cache = DirectoryCache(args.directory, args.max_size)
+    os.makedirs(cache.directory, exist_ok=True)
+    for path in getattr(cache, args.command)():
+        print("removed {}".format(path))
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,3 +1,4 @@
+import concurrent.futures
 import functools
 import itertools
 import operator
@@ -12,7 +13,9 @@ from mu.sco import old
 from mu.rhy import indispensability
 from mu.utils import tools
 
+from aml import caching
 from aml import globals_
+from aml import ticks
 
 
 class Bar(abjad.TimeSignature):
@@ -79,6 +82,23 @@ class Bar(abjad.TimeSignature):
 
 
 class Point(object):
+    """Position of a beat in a (repeating) MetricalLoop.
+
+    Melody transformations create a lot of short-living points, therefore the class
+    uses slots. The transitions to next points only depend on the loop and not on the
+    particular point, so that they are memoized in a 'transitions' dict that is shared
+    between all points of the same MetricalLoop.
+    """
+
+    __slots__ = (
+        "_nth",
+        "_nth_loop",
+        "_metrical_prime",
+        "_rhythm_and_metricity_per_prime",
+        "_loop_size",
+        "_transitions",
+    )
+
     def __init__(
         self,
         metrical_prime: int,
@@ -86,12 +106,17 @@ class Point(object):
         nth_loop: int,
         rhythm_and_metricity_per_prime: dict,
         loop_size: fractions.Fraction,
+        transitions: dict = None,
     ):
+        if transitions is None:
+            transitions = {}
+
         self._nth = nth
         self._nth_loop = nth_loop
         self._metrical_prime = metrical_prime
         self._rhythm_and_metricity_per_prime = rhythm_and_metricity_per_prime
         self._loop_size = loop_size
+        self._transitions = transitions
 
     def __repr__(self) -> str:
         return "Point({}, {}, {})".format(self.nth, self.nth_loop, self.metrical_prime)
@@ -123,6 +148,33 @@ class Point(object):
     def find_next_position(
         self, next_metrical_prime: int, expected_difference: fractions.Fraction
     ):
+        key = (
+            self._metrical_prime,
+            self._nth,
+            next_metrical_prime,
+            expected_difference,
+        )
+        try:
+            closest_index, n_loops_added = self._transitions[key]
+        except KeyError:
+            closest_index, n_loops_added = self._find_next_index(
+                next_metrical_prime, expected_difference
+            )
+            self._transitions[key] = (closest_index, n_loops_added)
+
+        return type(self)(
+            next_metrical_prime,
+            closest_index,
+            self._nth_loop + n_loops_added,
+            self._rhythm_and_metricity_per_prime,
+            self._loop_size,
+            self._transitions,
+        )
+
+    def _find_next_index(
+        self, next_metrical_prime: int, expected_difference: fractions.Fraction
+    ) -> tuple:
+        """Return (index, n_loops_added) - pair of the next position."""
         expected_position = self.relative_position + expected_difference
         next_metrical_prime_rhythms = self._rhythm_and_metricity_per_prime[
             next_metrical_prime
@@ -171,13 +223,7 @@ class Point(object):
                     key=operator.itemgetter(1),
                 )[0]
 
-        return type(self)(
-            next_metrical_prime,
-            closest_index,
-            self._nth_loop + n_loops_added,
-            self._rhythm_and_metricity_per_prime,
-            self._loop_size,
-        )
+        return closest_index, n_loops_added
 
 
 class SpreadMetricalLoop(object):
@@ -194,6 +240,7 @@ class SpreadMetricalLoop(object):
     ):
         self._n_repetitions = n_repetitions
         self._basic_bars = bars
+        self._rhythm_and_metricity_per_prime = rhythm_and_metricity_per_prime
         self._bars = tuple(tuple(abjad.TimeSignature(b) for b in bars) * n_repetitions)
         self._loop_duration = loop_duration
         self._duration = loop_duration * n_repetitions
@@ -253,6 +300,20 @@ class SpreadMetricalLoop(object):
     def __repr__(self) -> str:
         return "SpreadMetricalLoop({})".format(self._basic_bars)
 
+    def __reduce__(self) -> tuple:
+        # only the defining data get pickled, all repeated tuples are rebuilt
+        return (
+            type(self),
+            (
+                self._n_repetitions,
+                self._loop_duration,
+                self._loop_size,
+                self._basic_bars,
+                self._rhythm_and_metricity_per_prime,
+                self._instrument_prime_mapping,
+            ),
+        )
+
     @property
     def duration(self) -> fractions.Fraction:
         return self._duration
@@ -298,10 +359,46 @@ class SpreadMetricalLoop(object):
 
         raise KeyError("No prime contains absolute rhythm {}.".format(absolute_rhythm))
 
+    def _get_tick_grid_and_ticks(self, prime: int = None) -> tuple:
+        """Return (tick_grid, ticks) for all rhythms or for the rhythms of one prime.
+
+        Ticks are only calculated when they are needed for the first time.
+        """
+        ticks_per_prime = getattr(self, "_ticks_per_prime", None)
+        if ticks_per_prime is None:
+            self._tick_grid = ticks.TickGrid.from_values(self._absolute_rhythm)
+            ticks_per_prime = {
+                None: self._tick_grid.to_ticks_tuple(self._absolute_rhythm)
+            }
+            ticks_per_prime.update(
+                {
+                    prime: self._tick_grid.to_ticks_tuple(rhythms_and_metricities[0])
+                    for prime, rhythms_and_metricities in (
+                        self._absolute_rhythm_and_metricity_per_prime.items()
+                    )
+                }
+            )
+            self._ticks_per_prime = ticks_per_prime
+
+        return self._tick_grid, ticks_per_prime[prime]
+
     @staticmethod
     def _filter_rhythm_metricity_pairs(
-        absolute_rhythm_and_metricities: tuple, start: float = None, stop: float = None
+        absolute_rhythm_and_metricities: tuple,
+        start: float = None,
+        stop: float = None,
+        tick_grid_and_ticks: tuple = None,
     ) -> tuple:
+        if tick_grid_and_ticks:
+            tick_grid, sorted_ticks = tick_grid_and_ticks
+            start_idx = tick_grid.find_first_index(sorted_ticks, start) if start else 0
+            stop_idx = (
+                tick_grid.find_first_index(sorted_ticks, stop)
+                if stop
+                else len(sorted_ticks)
+            )
+            return absolute_rhythm_and_metricities[start_idx:stop_idx]
+
         start_idx = 0
 
         if start:
@@ -336,6 +433,7 @@ class SpreadMetricalLoop(object):
             tuple(zip(*self._absolute_rhythm_and_metricity_per_prime[prime])),
             start,
             stop,
+            self._get_tick_grid_and_ticks(prime) if ticks.is_enabled() else None,
         )
 
     def get_all_rhythms(self) -> tuple:
@@ -346,7 +444,10 @@ class SpreadMetricalLoop(object):
 
     def get_all_rhythm_metricitiy_pairs(self, start=None, stop=None) -> tuple:
         return self._filter_rhythm_metricity_pairs(
-            self._absolute_rhythm_and_metricities, start, stop
+            self._absolute_rhythm_and_metricities,
+            start,
+            stop,
+            self._get_tick_grid_and_ticks() if ticks.is_enabled() else None,
         )
 
     def get_rhythms_for_instrument(self, instrument: str) -> tuple:
@@ -381,10 +482,37 @@ class MetricalLoop(object):
         self._absolute_rhythm_and_metricity_per_prime = (
             self._get_absolute_rhythm_and_metricity_per_prime()
         )
+        # memoized transitions between points, see Point.find_next_position
+        self._point_transitions = {}
 
     def __repr__(self) -> str:
         return "MetricalLoop({})".format(self.bars)
 
+    _precomputed_attributes = (
+        "_n_attacks_per_bar",
+        "_pulse_rhythm_and_metricity_per_beat",
+        "_rhythm_and_metricity_per_prime",
+        "_absolute_rhythm_and_metricity_per_prime",
+    )
+
+    def _get_precomputed_data(self) -> tuple:
+        return tuple(
+            getattr(self, attribute) for attribute in self._precomputed_attributes
+        )
+
+    @classmethod
+    def _from_precomputed_data(cls, bars: tuple, data: tuple) -> "MetricalLoop":
+        """Make MetricalLoop without recalculating its rhythms and metricities."""
+        metrical_loop = cls.__new__(cls)
+        metrical_loop._primes = globals_.METRICAL_PRIMES
+        metrical_loop._size = functools.reduce(operator.mul, metrical_loop._primes)
+        metrical_loop._bars = tuple(bars)
+        metrical_loop._duration = sum(b.duration for b in bars)
+        for attribute, value in zip(cls._precomputed_attributes, data):
+            setattr(metrical_loop, attribute, value)
+        metrical_loop._point_transitions = {}
+        return metrical_loop
+
     @staticmethod
     def _find_n_attacks_per_bar(
         primes: tuple, bars: tuple, n_attacks2distribute: int
@@ -473,6 +601,22 @@ class MetricalLoop(object):
             )
         },
     ) -> tuple:
+        transformation, fitness = self._find_best_transformation(melody, mapping)
+        return (
+            (
+                self.make_transformed_melody(melody, transformation),
+                lambda: self.spread(transformation[-1], mapping),
+            ),
+            fitness,
+        )
+
+    def _find_best_transformation(self, melody: old.Melody, mapping: dict) -> tuple:
+        """Return (transformation, fitness) - pair.
+
+        Unlike 'transform_melody' the result doesn't contain any melody or lambda
+        function. It's therefore small and can be sent between processes. The melody
+        can be built afterwards with 'make_transformed_melody'.
+        """
         prime_number_per_event = []
         for tone in melody:
             if tone.pitch.is_empty:
@@ -498,26 +642,21 @@ class MetricalLoop(object):
         )
         for n_offsets in range(n_possible_offsets):
             if n_offsets > 0:
-                adapted_melody = melody.copy()
                 offset_duration = sum(
                     self._rhythm_and_metricity_per_prime[prime_number_per_event[0]][0][
                         :n_offsets
                     ]
                 )
-                adapted_melody.insert(
-                    0, old.Tone(mel.TheEmptyPitch, delay=offset_duration)
-                )
+                expected_distances = (fractions.Fraction(offset_duration),)
                 adapted_prime_number_per_event = (prime_number_per_event[0],) + tuple(
                     prime_number_per_event
                 )
 
             else:
-                adapted_melody = melody.copy()
+                expected_distances = tuple()
                 adapted_prime_number_per_event = tuple(prime_number_per_event)
 
-            expected_distances = tuple(
-                fractions.Fraction(d) for d in adapted_melody.delay
-            )
+            expected_distances += tuple(fractions.Fraction(d) for d in melody.delay)
 
             positions = [
                 Point(
@@ -526,6 +665,7 @@ class MetricalLoop(object):
                     0,
                     self._absolute_rhythm_and_metricity_per_prime,
                     self.duration,
+                    self._point_transitions,
                 )
             ]
             for expected_distance, prime_number in zip(
@@ -538,35 +678,54 @@ class MetricalLoop(object):
                 )
 
             absolute_rhythm = tuple(p.position for p in positions)
-            complete_duration = (positions[-1].nth_loop + 1) * self.duration
-
-            if absolute_rhythm[-1] != complete_duration:
-                absolute_rhythm += ((positions[-1].nth_loop + 1) * self.duration,)
-                adapted_melody.append(old.Tone(mel.TheEmptyPitch, delay=1))
-
             relative_rhythm = tuple(
                 b - a for a, b in zip(absolute_rhythm, absolute_rhythm[1:])
             )
-            new_melody = old.Melody(
-                [
-                    old.Tone(pitch=t.pitch, volume=t.volume, delay=r, duration=r)
-                    for t, r in zip(adapted_melody, relative_rhythm)
-                ]
-            )
-
             summed_metricity = sum(p.metricity for p in positions[:-1]) / len(positions)
             summed_deviation = sum(
                 abs(exp - real)
                 for exp, real in zip(expected_distances, relative_rhythm)
             )
+            # the melody itself is only built for the winner
             hof.append(
-                (new_melody, positions[-1].nth_loop + 1),
+                (
+                    offset_duration if n_offsets > 0 else 0,
+                    absolute_rhythm,
+                    positions[-1].nth_loop + 1,
+                ),
                 summed_metricity,
                 summed_deviation,
             )
 
         best = hof.convert2list()[-1]
-        return (best[0][0], lambda: self.spread(best[0][-1], mapping)), best[1]
+        return best[0], best[1]
+
+    def make_transformed_melody(
+        self, melody: old.Melody, transformation: tuple
+    ) -> old.Melody:
+        """Build melody from a transformation that has been found for this loop.
+
+        'transformation' is a (offset_duration, absolute_rhythm, n_repetitions) triple.
+        """
+        offset_duration, absolute_rhythm, n_repetitions = transformation
+        adapted_melody = melody.copy()
+        if offset_duration:
+            adapted_melody.insert(0, old.Tone(mel.TheEmptyPitch, delay=offset_duration))
+
+        complete_duration = n_repetitions * self.duration
+        if absolute_rhythm[-1] != complete_duration:
+            absolute_rhythm += (complete_duration,)
+            adapted_melody.append(old.Tone(mel.TheEmptyPitch, delay=1))
+
+        relative_rhythm = tuple(
+            b - a for a, b in zip(absolute_rhythm, absolute_rhythm[1:])
+        )
+        return old.Melody(
+            [
+                old.Tone(pitch=t.pitch, volume=t.volume, delay=r, duration=r)
+                for t, r in zip(adapted_melody, relative_rhythm)
+            ]
+        )
 
     def spread(
         self, n_repetitions: int, instrument_prime_mapping: dict
@@ -581,54 +740,156 @@ class MetricalLoop(object):
         )
 
 
-class ComplexMeterTranscriber(object):
-    _available_metrical_loops = functools.reduce(
+# the available metrical loops are all permutations of the following bar groups
+_METRICAL_LOOP_BAR_GROUPS = (
+    ((5, 4), (3, 4), (4, 4)),
+    ((5, 4), (6, 8), (4, 4)),
+    ((3, 4), (3, 4), (4, 4)),
+    ((6, 8), (3, 4), (4, 4)),
+    ((6, 8), (6, 8), (4, 4)),
+    ((5, 4), (5, 4)),
+    ((4, 4), (3, 4), (3, 4), (2, 4)),
+    ((2, 4), (6, 8), (4, 4), (3, 4)),
+    ((2, 4), (6, 8), (4, 4), (6, 8)),
+    ((3, 4), (2, 4), (3, 4), (2, 4)),
+    ((6, 8), (2, 4), (3, 4), (2, 4)),
+)
+
+
+def _make_metrical_loop_table() -> tuple:
+    """Return tuple with one (time_signatures, precomputed_data) pair per loop."""
+    bar_groups = tuple(
+        tuple(Bar(ts) for ts in bar_group) for bar_group in _METRICAL_LOOP_BAR_GROUPS
+    )
+    metrical_loops = functools.reduce(
         operator.add,
         tuple(
             tuple(
                 MetricalLoop(*permuted_bars)
                 for permuted_bars in set(itertools.permutations(bars))
             )
-            for bars in (
-                (Bar((5, 4)), Bar((3, 4)), Bar((4, 4))),
-                (Bar((5, 4)), Bar((6, 8)), Bar((4, 4))),
-                (Bar((3, 4)), Bar((3, 4)), Bar((4, 4))),
-                (Bar((6, 8)), Bar((3, 4)), Bar((4, 4))),
-                (Bar((6, 8)), Bar((6, 8)), Bar((4, 4))),
-                (Bar((5, 4)), Bar((5, 4))),
-                (Bar((4, 4)), Bar((3, 4)), Bar((3, 4)), Bar((2, 4))),
-                (Bar((2, 4)), Bar((6, 8)), Bar((4, 4)), Bar((3, 4))),
-                (Bar((2, 4)), Bar((6, 8)), Bar((4, 4)), Bar((6, 8))),
-                (Bar((3, 4)), Bar((2, 4)), Bar((3, 4)), Bar((2, 4))),
-                (Bar((6, 8)), Bar((2, 4)), Bar((3, 4)), Bar((2, 4))),
-            )
+            for bars in bar_groups
         ),
     )
-
-    def __call__(self, melody: old.Melody) -> tuple:
-        """Return (Melody, MetricalLoop) - pair."""
-        possible_mappings = tuple(
-            {"violin": p[0], "viola": p[1], "cello": p[2]}
-            for p in itertools.permutations(globals_.METRICAL_PRIMES)
+    return tuple(
+        (
+            tuple((bar.numerator, bar.denominator) for bar in metrical_loop.bars),
+            metrical_loop._get_precomputed_data(),
         )
+        for metrical_loop in metrical_loops
+    )
 
-        melody = old.Melody(melody)
 
-        hof = crosstrainer.MultiDimensionalRating(fitness=[1, -1])
+def _load_metrical_loops() -> tuple:
+    table = caching.load_or_build(
+        "{}/metrical_loops.pickle".format(globals_.CACHE_PATH),
+        caching.hash_data(
+            globals_.AVAILABLE_TIME_SIGNATURES,
+            globals_.METRICAL_PRIMES,
+            _METRICAL_LOOP_BAR_GROUPS,
+            caching.hash_files(__file__),
+        ),
+        _make_metrical_loop_table,
+    )
+    bars = {ts: Bar(ts) for ts in set(itertools.chain(*_METRICAL_LOOP_BAR_GROUPS))}
+    return tuple(
+        MetricalLoop._from_precomputed_data(tuple(bars[ts] for ts in loop_bars), data)
+        for loop_bars, data in table
+    )
 
-        c = 0
-        for metrical_loop in self._available_metrical_loops:
-            for mapping in possible_mappings:
-                transformation = metrical_loop.transform_melody(melody, mapping)
-                relevant_data, fitness = transformation
-                hof.append(relevant_data, *fitness)
 
-            c += 1
+def _transform_melody_with_metrical_loop(melody: old.Melody, nth_metrical_loop: int):
+    """Return best transformation for each possible mapping (used by process pools)."""
+    metrical_loops = ComplexMeterTranscriber().available_metrical_loops
+    metrical_loop = metrical_loops[nth_metrical_loop]
+    return tuple(
+        metrical_loop._find_best_transformation(melody, mapping)
+        for mapping in ComplexMeterTranscriber.possible_mappings
+    )
 
-        best = hof.convert2list()[-1]
-        melody, spread_metrical_loop = best[0]
 
-        # it's only a lambda function before for preventing to generate unused objects
-        spread_metrical_loop = spread_metrical_loop()
+class ComplexMeterTranscriber(object):
+    """Find the metrical loop and instrument - prime mapping that fits best to a melody.
 
+    With jobs > 1 the metrical loops are evaluated in parallel by a process pool. The
+    results are collected in the same order as in the serial evaluation, so that the
+    chosen meter doesn't depend on the number of jobs.
+    """
+
+    possible_mappings = tuple(
+        {"violin": p[0], "viola": p[1], "cello": p[2]}
+        for p in itertools.permutations(globals_.METRICAL_PRIMES)
+    )
+
+    # metrical loops are only loaded when they are needed for the first time
+    _available_metrical_loops = None
+
+    def __init__(self, jobs: int = 1):
+        self.jobs = jobs
+
+    @property
+    def available_metrical_loops(self) -> tuple:
+        if ComplexMeterTranscriber._available_metrical_loops is None:
+            ComplexMeterTranscriber._available_metrical_loops = _load_metrical_loops()
+
+        return ComplexMeterTranscriber._available_metrical_loops
+
+    def _find_transformations(self, melody: old.Melody, jobs: int) -> tuple:
+        """Return one tuple of transformations (one per mapping) per metrical loop."""
+        n_metrical_loops = len(self.available_metrical_loops)
+        if jobs > 1:
+            with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as executor:
+                return tuple(
+                    executor.map(
+                        _transform_melody_with_metrical_loop,
+                        itertools.repeat(melody, n_metrical_loops),
+                        range(n_metrical_loops),
+                        chunksize=max(1, n_metrical_loops // (jobs * 4)),
+                    )
+                )
+
+        return tuple(
+            _transform_melody_with_metrical_loop(melody, nth_metrical_loop)
+            for nth_metrical_loop in range(n_metrical_loops)
+        )
+
+    def find_candidates(self, melody: old.Melody, jobs: int = None) -> tuple:
+        """Return one ((MetricalLoop, mapping, transformation), fitness) - pair per
+        combination of metrical loop and instrument - prime mapping."""
+        if jobs is None:
+            jobs = self.jobs
+
+        candidates = []
+        for metrical_loop, transformations in zip(
+            self.available_metrical_loops, self._find_transformations(melody, jobs)
+        ):
+            for mapping, (transformation, fitness) in zip(
+                self.possible_mappings, transformations
+            ):
+                candidates.append(((metrical_loop, mapping, transformation), fitness))
+
+        return tuple(candidates)
+
+    @staticmethod
+    def find_best_candidate(candidates: tuple) -> tuple:
+        """Return (MetricalLoop, mapping, transformation) - triple of the winner."""
+        hof = crosstrainer.MultiDimensionalRating(fitness=[1, -1])
+        for candidate, fitness in candidates:
+            hof.append(candidate, *fitness)
+
+        return hof.convert2list()[-1][0]
+
+    @staticmethod
+    def make_result(melody: old.Melody, candidate: tuple) -> tuple:
+        """Return (Melody, bars, SpreadMetricalLoop) - triple for a candidate."""
+        metrical_loop, mapping, transformation = candidate
+        # melodies and spread metrical loops are only generated for the winner
+        melody = metrical_loop.make_transformed_melody(melody, transformation)
+        spread_metrical_loop = metrical_loop.spread(transformation[-1], mapping)
         return melody, spread_metrical_loop.bars, spread_metrical_loop
+
+    def __call__(self, melody: old.Melody, jobs: int = None) -> tuple:
+        """Return (Melody, bars, SpreadMetricalLoop) - triple."""
+        melody = old.Melody(melody)
+        candidates = self.find_candidates(melody, jobs)
+        return self.make_result(melody, self.find_best_candidate(candidates))
@@ -2,27 +2,30 @@ import abc
 import functools
 import numpy as np
 import operator
-import os
 
 import abjad
-import pyo
 
 from mu.mel import ji
 from mutools import mus
 
+from aml import caching
+
+
+_SCALE_DISTRIBUTION_PATH = "aml/scale_distribution/pelog_scale_{}.json"
+_SCALE_DEGREE_PATH = "aml/scale/pelog_scale_degree_{}.json"
+_SCL_PATH = "aml/scale/pelog_av.scl"
+
+CACHE_PATH = "aml/cache"
+
 
 def _load_scale(idx: int) -> tuple:
-    return tuple(
-        ji.JIMel.load_json("aml/scale_distribution/pelog_scale_{}.json".format(idx))
-    )
+    return tuple(ji.JIMel.load_json(_SCALE_DISTRIBUTION_PATH.format(idx)))
 
 
 def _load_intonations_per_scale_degree() -> tuple:
     intonations_per_scale_degree = []
     for scale_degree in range(7):
-        loaded = ji.JIMel.load_json(
-            "aml/scale/pelog_scale_degree_{}.json".format(scale_degree)
-        )
+        loaded = ji.JIMel.load_json(_SCALE_DEGREE_PATH.format(scale_degree))
         intonations_per_scale_degree.append(tuple(sorted(loaded)))
 
     return tuple(intonations_per_scale_degree)
@@ -33,12 +36,28 @@ def _filter_auxiliary_pitches(scale: tuple) -> tuple:
     return tuple(p for idx, p in enumerate(scale) if idx not in auxiliary_pitches)
 
 
-AVAILABLE_VERSES = tuple(
-    (splitted_path[1], splitted_path[2])
-    for splitted_path in (
-        path[:-4].split("_") for path in os.listdir("aml/transcriptions")
-    )
-)
+TRANSCRIPTIONS_PATH = "aml/transcriptions"
+TRANSCRIPTION_PATH = "{}/qiroah_{{}}_{{}}.svl".format(TRANSCRIPTIONS_PATH)
+QIROAH_SAMPLE_PATH = "aml/samples/qiroah/without_reverb/qiroah_{}_{}.wav"
+
+# computed transcriptions are shared by all verse builds
+TRANSCRIPTION_CACHE_PATH = "{}/transcriptions".format(CACHE_PATH)
+TRANSCRIPTION_CACHE_MAX_SIZE = 1 << 30
+
+# analysis results of VerseMaker (breads with harmonic fields, areas, ...)
+VERSE_ANALYSIS_CACHE_PATH = "{}/verse_analyses".format(CACHE_PATH)
+VERSE_ANALYSIS_CACHE_MAX_SIZE = 1 << 30
+
+
+def __getattr__(name: str):
+    # available verses are only read from the transcription manifest when needed
+    if name == "AVAILABLE_VERSES":
+        from aml import manifest
+
+        return manifest.available_verses()
+
+    raise AttributeError("module '{}' has no attribute '{}'".format(__name__, name))
+
 
 RESOLUTION = mus.STANDARD_RESOLUTION
 
@@ -58,50 +77,226 @@ ORCHESTRATION = mus.Orchestration(
 )
 
 
-INTONATIONS_PER_SCALE_DEGREE = _load_intonations_per_scale_degree()
+# abjad pitch class names for each intonation (in the same order as the intonations in
+# INTONATIONS_PER_SCALE_DEGREE)
+_PITCH_CLASS_PER_INTONATION = (
+    "cxf",
+    "c",
+    "cxs",
+    "dstf",
+    "csts",  # instead of "dftf" for avoiding bb when playing artifical harmonic
+    "dqf",
+    "dxs",  # instead of "efxf",
+    "drs",  # instead of "etrf",
+    # "dfts",  # instead of "estf",
+    "estf",  # undo
+    "f",
+    "fxs",
+    "fqs",
+    "gqf",
+    "gxf",
+    "g",
+    # "grs",  # instead of "atrf",
+    "atrf",  # undo
+    "gfts",  # instead of "astf",
+    "aftf",
+    "axs",  # instead of "bfxf"
+    # "ars",  # instead of "btrf" for avoiding bb when writing artifical harmonic
+    "btrf",
+    # "as",  # instead of "bf",
+    "bf",  # undo
+)
+
+_ARTIFICAL_HARMONIC_PITCHCLASS_AND_OCTAVE_PER_INTONATION = (
+    ("fxf", 1),
+    ("af", -1),
+    ("fxs", 0),
+    ("gstf", 0),
+    ("ats", -1),  # instead of ("betf", -1) for avoiding bb
+    ("gqf", 0),
+    ("gxs", 0),  # instead of ("afxf", 0),
+    ("bxf", -1),  # insteaf of ("ctrf", 0),
+    # ("gfts", 0),  # instead of ("astf", 0),
+    ("astf", 0),  # undo
+    ("bf", 0),
+    ("drf", 0),
+    ("bqf", 0),
+    ("cqf", 1),
+    ("etrf", 0),
+    ("c", 1),
+    # ("crs", 1),  # instead of ("dtrf", 1),
+    ("dtrf", 1),  # undo
+    ("etf", 0),  # instead of ("fstf", 0),
+    ("dftf", 1),
+    ("fxs", 0),  # instead of ("gfxf", 0)
+    # ("drs", 1),  # instead of ("etrf", 1)
+    ("etrf", 1),  # undo
+    # ("ds", 1),  # instead of ("ef", 1),
+    ("ef", 1),  # undo
+)
+
+
+def _make_ratio2pitch_class_dict(
+    intonations_per_scale_degree: tuple, pitch_class_per_intonation: tuple
+) -> dict:
+    return {
+        ratio.register(0): pitch
+        for ratio, pitch in zip(
+            functools.reduce(operator.add, intonations_per_scale_degree),
+            pitch_class_per_intonation,
+        )
+    }
+
+
+def _detect_closeness_from_pitch_x_to_pitch_y(
+    intonations_per_scale_degree: tuple,
+) -> dict:
+    closeness_from_pitch_x_to_pitch_y = {}
+    harmonicity_net = {}
+    for scale_degree_idx, scale_degree0 in enumerate(intonations_per_scale_degree):
+        for intonation in scale_degree0:
+            intonation = intonation.normalize()
+            pitch_harmonicity_pairs = []
+            for scale_degree1_idx, scale_degree1 in enumerate(
+                intonations_per_scale_degree
+            ):
+                if scale_degree1_idx != scale_degree_idx:
+                    for intonation1 in scale_degree1:
+                        intonation1 = intonation1.normalize()
+                        harmonicity = (
+                            intonation - intonation1
+                        ).harmonicity_simplified_barlow
+                        pitch_harmonicity_pairs.append((intonation1, harmonicity))
+                        harmonicity_net.update(
+                            {tuple(sorted((intonation, intonation1))): harmonicity}
+                        )
+            sorted_pitches = tuple(
+                map(
+                    operator.itemgetter(0),
+                    sorted(
+                        pitch_harmonicity_pairs,
+                        key=operator.itemgetter(1),
+                        reverse=True,
+                    ),
+                )
+            )
+            closeness_from_pitch_x_to_pitch_y.update(
+                {
+                    intonation: {
+                        pitch: n
+                        for n, pitch in zip(
+                            np.linspace(1, 0, len(sorted_pitches), dtype=float),
+                            sorted_pitches,
+                        )
+                    }
+                }
+            )
+    return closeness_from_pitch_x_to_pitch_y, harmonicity_net
+
+
+def _make_harmonicity_matrix(
+    intonations_per_scale_degree: tuple, harmonicity_net: dict
+) -> tuple:
+    """Return (intonations, harmonicity_matrix) - pair.
+
+    The position of a normalized intonation in 'intonations' is its integer id. The
+    matrix contains the harmonicity between each pair of intonations and NaN for pairs
+    that aren't part of the harmonicity net (intonations of the same scale degree).
+    """
+    intonations = tuple(
+        dict.fromkeys(
+            intonation.normalize()
+            for scale_degree in intonations_per_scale_degree
+            for intonation in scale_degree
+        )
+    )
+    intonation2id = {intonation: idx for idx, intonation in enumerate(intonations)}
+    harmonicity_matrix = np.full((len(intonations), len(intonations)), np.nan)
+    for (intonation0, intonation1), harmonicity in harmonicity_net.items():
+        id0, id1 = intonation2id[intonation0], intonation2id[intonation1]
+        harmonicity_matrix[id0, id1] = harmonicity
+        harmonicity_matrix[id1, id0] = harmonicity
+
+    return intonations, harmonicity_matrix
+
+
+def _make_pitch2scale_degree_dict(intonations_per_scale_degree: tuple) -> dict:
+    d = {}
+    for sd, pitches in enumerate(intonations_per_scale_degree):
+        for into in pitches:
+            d.update({into.normalize(): sd})
+    return d
+
+
+def _make_pitch2instrument_dict(scale_per_instrument: dict) -> dict:
+    d = {}
+
+    for instr in scale_per_instrument:
+        for p in scale_per_instrument[instr]:
+            d.update({p.normalize(): instr})
+
+    return d
+
+
+def _make_pitch_tables() -> dict:
+    intonations_per_scale_degree = _load_intonations_per_scale_degree()
+    scale_per_instrument = {
+        instr: tuple(p.normalize() for p in _load_scale(idx))
+        for idx, instr in enumerate(("violin", "viola", "cello"))
+    }
+    closeness, harmonicity_net = _detect_closeness_from_pitch_x_to_pitch_y(
+        intonations_per_scale_degree
+    )
+    intonations, harmonicity_matrix = _make_harmonicity_matrix(
+        intonations_per_scale_degree, harmonicity_net
+    )
+    return {
+        "intonations_per_scale_degree": intonations_per_scale_degree,
+        "original_scale": tuple(p.cents for p in ji.JIMel.from_scl(_SCL_PATH, 260))[
+            :-1
+        ],
+        "ratio2pitchclass": _make_ratio2pitch_class_dict(
+            intonations_per_scale_degree, _PITCH_CLASS_PER_INTONATION
+        ),
+        "ratio2artifical_harmonic_pitchclass_and_octave": _make_ratio2pitch_class_dict(
+            intonations_per_scale_degree,
+            _ARTIFICAL_HARMONIC_PITCHCLASS_AND_OCTAVE_PER_INTONATION,
+        ),
+        "scale_per_instrument": scale_per_instrument,
+        "closeness_from_px_to_py": closeness,
+        "harmonicity_net": harmonicity_net,
+        "intonations": intonations,
+        "harmonicity_matrix": harmonicity_matrix,
+        "pitch2scale_degree": _make_pitch2scale_degree_dict(
+            intonations_per_scale_degree
+        ),
+        "pitch2instrument": _make_pitch2instrument_dict(scale_per_instrument),
+    }
+
+
+# all pitch tables are derived from the scale files (and the code in this module) and
+# are only recalculated if any of those files changed. Caches of data that depend on
+# the pitch tables have to include this key.
+PITCH_TABLES_KEY = caching.hash_files(
+    __file__,
+    _SCL_PATH,
+    *(_SCALE_DEGREE_PATH.format(sd) for sd in range(7)),
+    *(_SCALE_DISTRIBUTION_PATH.format(idx) for idx in range(3)),
+)
+_PITCH_TABLES = caching.load_or_build(
+    "{}/pitch_tables.pickle".format(CACHE_PATH), PITCH_TABLES_KEY, _make_pitch_tables
+)
+
+INTONATIONS_PER_SCALE_DEGREE = _PITCH_TABLES["intonations_per_scale_degree"]
 FILTERED_INTONATIONS_PER_SCALE_DEGREE = _filter_auxiliary_pitches(
     INTONATIONS_PER_SCALE_DEGREE
 )
 
-ORIGINAL_SCALE = tuple(
-    p.cents for p in ji.JIMel.from_scl("aml/scale/pelog_av.scl", 260)
-)[:-1]
+ORIGINAL_SCALE = _PITCH_TABLES["original_scale"]
 
 FILTERED_ORIGINAL_SCALE = _filter_auxiliary_pitches(ORIGINAL_SCALE)
 
-RATIO2PITCHCLASS = {
-    ratio.register(0): pitch
-    for ratio, pitch in zip(
-        functools.reduce(operator.add, INTONATIONS_PER_SCALE_DEGREE),
-        (
-            "cxf",
-            "c",
-            "cxs",
-            "dstf",
-            "csts",  # instead of "dftf" for avoiding bb when playing artifical harmonic
-            "dqf",
-            "dxs",  # instead of "efxf",
-            "drs",  # instead of "etrf",
-            # "dfts",  # instead of "estf",
-            "estf",  # undo
-            "f",
-            "fxs",
-            "fqs",
-            "gqf",
-            "gxf",
-            "g",
-            # "grs",  # instead of "atrf",
-            "atrf",  # undo
-            "gfts",  # instead of "astf",
-            "aftf",
-            "axs",  # instead of "bfxf"
-            # "ars",  # instead of "btrf" for avoiding bb when writing artifical harmonic
-            "btrf",
-            # "as",  # instead of "bf",
-            "bf",  # undo
-        ),
-    )
-}
+RATIO2PITCHCLASS = _PITCH_TABLES["ratio2pitchclass"]
 
 
 def _mk_midi_pitch2abjad_pitch_tuple() -> tuple:
@@ -125,44 +320,11 @@ def _mk_midi_pitch2abjad_pitch_tuple() -> tuple:
 MIDI_PITCH2ABJAD_PITCH = _mk_midi_pitch2abjad_pitch_tuple()
 
 
-RATIO2ARTIFICAL_HARMONIC_PITCHCLASS_AND_ARTIFICIAL_HARMONIC_OCTAVE = {
-    ratio.register(0): pitch
-    for ratio, pitch in zip(
-        functools.reduce(operator.add, INTONATIONS_PER_SCALE_DEGREE),
-        (
-            ("fxf", 1),
-            ("af", -1),
-            ("fxs", 0),
-            ("gstf", 0),
-            ("ats", -1),  # instead of ("betf", -1) for avoiding bb
-            ("gqf", 0),
-            ("gxs", 0),  # instead of ("afxf", 0),
-            ("bxf", -1),  # insteaf of ("ctrf", 0),
-            # ("gfts", 0),  # instead of ("astf", 0),
-            ("astf", 0),  # undo
-            ("bf", 0),
-            ("drf", 0),
-            ("bqf", 0),
-            ("cqf", 1),
-            ("etrf", 0),
-            ("c", 1),
-            # ("crs", 1),  # instead of ("dtrf", 1),
-            ("dtrf", 1),  # undo
-            ("etf", 0),  # instead of ("fstf", 0),
-            ("dftf", 1),
-            ("fxs", 0),  # instead of ("gfxf", 0)
-            # ("drs", 1),  # instead of ("etrf", 1)
-            ("etrf", 1),  # undo
-            # ("ds", 1),  # instead of ("ef", 1),
-            ("ef", 1),  # undo
-        ),
-    )
-}
+RATIO2ARTIFICAL_HARMONIC_PITCHCLASS_AND_ARTIFICIAL_HARMONIC_OCTAVE = _PITCH_TABLES[
+    "ratio2artifical_harmonic_pitchclass_and_octave"
+]
 
-SCALE_PER_INSTRUMENT = {
-    instr: tuple(p.normalize() for p in _load_scale(idx))
-    for idx, instr in enumerate(("violin", "viola", "cello"))
-}
+SCALE_PER_INSTRUMENT = _PITCH_TABLES["scale_per_instrument"]
 
 A_CONCERT_PITCH = 442  # a' with 442 Hz
 CONCERT_PITCH = A_CONCERT_PITCH / (pow(2, 1 / 12) ** 9)
@@ -258,77 +420,15 @@ VIOLIN = _AdaptedViolin()
 INSTRUMENT_NAME2ADAPTED_INSTRUMENT = {"cello": CELLO, "violin": VIOLIN, "viola": VIOLA}
 
 
-def _detect_closeness_from_pitch_x_to_pitch_y(
-    intonations_per_scale_degree: tuple,
-) -> dict:
-    closeness_from_pitch_x_to_pitch_y = {}
-    harmonicity_net = {}
-    for scale_degree_idx, scale_degree0 in enumerate(intonations_per_scale_degree):
-        for intonation in scale_degree0:
-            intonation = intonation.normalize()
-            pitch_harmonicity_pairs = []
-            for scale_degree1_idx, scale_degree1 in enumerate(
-                intonations_per_scale_degree
-            ):
-                if scale_degree1_idx != scale_degree_idx:
-                    for intonation1 in scale_degree1:
-                        intonation1 = intonation1.normalize()
-                        harmonicity = (
-                            intonation - intonation1
-                        ).harmonicity_simplified_barlow
-                        pitch_harmonicity_pairs.append((intonation1, harmonicity))
-                        harmonicity_net.update(
-                            {tuple(sorted((intonation, intonation1))): harmonicity}
-                        )
-            sorted_pitches = tuple(
-                map(
-                    operator.itemgetter(0),
-                    sorted(
-                        pitch_harmonicity_pairs,
-                        key=operator.itemgetter(1),
-                        reverse=True,
-                    ),
-                )
-            )
-            closeness_from_pitch_x_to_pitch_y.update(
-                {
-                    intonation: {
-                        pitch: n
-                        for n, pitch in zip(
-                            np.linspace(1, 0, len(sorted_pitches), dtype=float),
-                            sorted_pitches,
-                        )
-                    }
-                }
-            )
-    return closeness_from_pitch_x_to_pitch_y, harmonicity_net
-
-
-CLOSENESS_FROM_PX_TO_PY, HARMONICITY_NET = _detect_closeness_from_pitch_x_to_pitch_y(
-    INTONATIONS_PER_SCALE_DEGREE
-)
-
-
-def _make_pitch2scale_degree_dict(intonations_per_scale_degree: tuple) -> dict:
-    d = {}
-    for sd, pitches in enumerate(intonations_per_scale_degree):
-        for into in pitches:
-            d.update({into.normalize(): sd})
-    return d
-
+CLOSENESS_FROM_PX_TO_PY = _PITCH_TABLES["closeness_from_px_to_py"]
+HARMONICITY_NET = _PITCH_TABLES["harmonicity_net"]
 
-def _make_pitch2instrument_dict(scale_per_instrument: dict) -> dict:
-    d = {}
+# dense version of the harmonicity net, indexed by the ids of normalized intonations
+INTONATIONS = _PITCH_TABLES["intonations"]
+HARMONICITY_MATRIX = _PITCH_TABLES["harmonicity_matrix"]
 
-    for instr in scale_per_instrument:
-        for p in scale_per_instrument[instr]:
-            d.update({p.normalize(): instr})
-
-    return d
-
-
-PITCH2SCALE_DEGREE = _make_pitch2scale_degree_dict(INTONATIONS_PER_SCALE_DEGREE)
-PITCH2INSTRUMENT = _make_pitch2instrument_dict(SCALE_PER_INSTRUMENT)
+PITCH2SCALE_DEGREE = _PITCH_TABLES["pitch2scale_degree"]
+PITCH2INSTRUMENT = _PITCH_TABLES["pitch2instrument"]
 
 
 INSTRUMENT_NAME2OBJECT = {
@@ -413,10 +513,6 @@ INTRODUCTION_PICTURES_PATH = "{}/pictures".format(INTRODUCTION_PATH)
 COVER_PATH = "aml/cover"
 STOCHASTIC_PITCH_ANALYSIS_PATH = "aml/stochastic_pitch_analysis"
 
-PYO_SERVER = pyo.Server(sr=44100, audio="offline", nchnls=3)
-PYO_SERVER.boot()
-
-
 ADD_COMPROVISATION = False
 
 # paper format for score
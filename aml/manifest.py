@@ -0,0 +1,184 @@
+"""Manifest of all available qiroah transcriptions.
+
+For each (chapter, verse) pair the manifest stores basic information about the SVL
+file (made with Tony) and the respective recording, so that tools can plan batch
+builds and validate their inputs without parsing every SVL file. The manifest gets
+saved in the cache directory and is only updated for files whose modification time
+or size changed.
+
+Usage (from the root of the repository):
+
+    python -m aml.manifest [--validate]
+"""
+
+import argparse
+import functools
+import json
+import os
+import sys
+
+import xml.etree.ElementTree as ET
+
+from aml import audio
+from aml import caching
+from aml import globals_
+
+
+MANIFEST_PATH = "{}/transcription_manifest.json".format(globals_.CACHE_PATH)
+
+
+def _split_svl_name(svl_name: str) -> tuple:
+    """Return (chapter, verse) - pair for a name like 'qiroah_59_opening.svl'."""
+    _, chapter, verse = svl_name[:-4].split("_")
+    return chapter, verse
+
+
+def _analyse_svl(svl_path: str) -> dict:
+    n_notes = 0
+    model_attributes = None
+    for _, element in ET.iterparse(svl_path):
+        if element.tag == "point":
+            n_notes += 1
+        elif element.tag == "model" and model_attributes is None:
+            model_attributes = dict(element.attrib)
+        element.clear()
+
+    return {
+        "sample_rate": int(model_attributes["sampleRate"]),
+        "n_notes": n_notes,
+        "frequency_range": (
+            float(model_attributes["minimum"]),
+            float(model_attributes["maximum"]),
+        ),
+    }
+
+
+def get_wav_duration(sf_path: str) -> float:
+    """Return duration of a wave file in seconds by only reading its chunk headers."""
+    info = audio.read_wav_info(sf_path)
+    return info["data_size"] / info["byte_rate"]
+
+
+def _get_file_state(path: str) -> tuple:
+    stat = os.stat(path)
+    return stat.st_mtime, stat.st_size
+
+
+def _make_entry(chapter: str, verse: str, old_entry: dict = None) -> dict:
+    svl_path = globals_.TRANSCRIPTION_PATH.format(chapter, verse)
+    sf_path = globals_.QIROAH_SAMPLE_PATH.format(chapter, verse)
+    svl_state = _get_file_state(svl_path)
+    sf_state = _get_file_state(sf_path) if os.path.isfile(sf_path) else None
+
+    if old_entry:
+        if (
+            tuple(old_entry["svl_state"]) == svl_state
+            and (tuple(old_entry["sf_state"]) if old_entry["sf_state"] else None)
+            == sf_state
+        ):
+            return old_entry
+
+    entry = {
+        "chapter": chapter,
+        "verse": verse,
+        "svl_path": svl_path,
+        "svl_state": svl_state,
+        "svl_hash": caching.hash_files(svl_path),
+        "sf_path": sf_path if sf_state else None,
+        "sf_state": sf_state,
+        "sf_hash": caching.hash_files(sf_path) if sf_state else None,
+        "audio_duration": get_wav_duration(sf_path) if sf_state else None,
+    }
+    entry.update(_analyse_svl(svl_path))
+    return entry
+
+
+def build_manifest(manifest_path: str = MANIFEST_PATH) -> tuple:
+    """Update manifest file and return its entries (sorted by file name)."""
+    try:
+        with open(manifest_path, "r") as f:
+            old_manifest = json.load(f)
+    except (OSError, ValueError):
+        old_manifest = {}
+
+    manifest = {}
+    for svl_name in sorted(os.listdir(globals_.TRANSCRIPTIONS_PATH)):
+        if svl_name.endswith(".svl"):
+            chapter, verse = _split_svl_name(svl_name)
+            key = "{}_{}".format(chapter, verse)
+            manifest.update({key: _make_entry(chapter, verse, old_manifest.get(key))})
+
+    # compare serialized versions, because tuples are saved as lists
+    serialized_manifest = json.dumps(manifest, indent=4, sort_keys=True)
+    if serialized_manifest != json.dumps(old_manifest, indent=4, sort_keys=True):
+        caching.atomic_write(manifest_path, serialized_manifest.encode())
+
+    return tuple(manifest.values())
+
+
+@functools.lru_cache(maxsize=1)
+def load_manifest() -> tuple:
+    """Return manifest entries (the manifest is only updated once per process)."""
+    return build_manifest()
+
+
+def available_verses() -> tuple:
+    return tuple((entry["chapter"], entry["verse"]) for entry in load_manifest())
+
+
+def find_entry(chapter, verse) -> dict:
+    for entry in load_manifest():
+        if entry["chapter"] == str(chapter) and entry["verse"] == str(verse):
+            return entry
+
+    raise KeyError("No transcription for chapter {} verse {}.".format(chapter, verse))
+
+
+def validate(entries: tuple = None) -> tuple:
+    """Return messages for all entries that can't be transcribed."""
+    if entries is None:
+        entries = load_manifest()
+
+    problems = []
+    for entry in entries:
+        name = "{}_{}".format(entry["chapter"], entry["verse"])
+        if entry["n_notes"] == 0:
+            problems.append("{}: SVL file doesn't contain any notes".format(name))
+        if entry["sf_path"] is None:
+            problems.append("{}: recording is missing".format(name))
+        elif entry["audio_duration"] == 0:
+            problems.append("{}: recording is empty".format(name))
+
+    return tuple(problems)
+
+
+def main(args: tuple = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--validate", action="store_true")
+    args = parser.parse_args(args)
+
+    entries = build_manifest()
+    for entry in entries:
+        print(
+            "{:>3} {:<10} {:>4} notes  {:>8.2f} - {:>8.2f} Hz  {}".format(
+                entry["chapter"],
+                entry["verse"],
+                entry["n_notes"],
+                *entry["frequency_range"],
+                "{:.2f}s".format(entry["audio_duration"])
+                if entry["audio_duration"] is not None
+                else "no recording",
+            )
+        )
+
+    if args.validate:
+        problems = validate(entries)
+        for problem in problems:
+            print(problem)
+        return int(bool(problems))
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,163 @@
+"""Registry that interns all pitches of the piece as small integers.
+
+Normalizing JIPitch objects, calculating their cents or their octave and hashing them
+for dictionary lookups is slow compared to working with integers. The registry gives
+each pitch an integer id and precalculates all properties that the algorithms of this
+package need in parallel arrays (one entry per id).
+
+The normalized intonations of the scale are interned first, in the order of
+globals_.INTONATIONS, so that their ids can directly be used as indices of
+globals_.HARMONICITY_MATRIX. All other ids depend on the order in which pitches have
+been interned and therefore shouldn't be saved or sent to other processes.
+"""
+
+import numpy as np
+
+from aml import globals_
+
+
+_ARTIFICAL_HARMONIC_PER_RATIO = (
+    globals_.RATIO2ARTIFICAL_HARMONIC_PITCHCLASS_AND_ARTIFICIAL_HARMONIC_OCTAVE
+)
+
+
+class PitchRegistry(object):
+    """Intern pitches and look up their precalculated properties.
+
+    Hot loops should intern each pitch once (with 'intern') and then only use the
+    methods that take ids ('get_pitch', 'get_normalized_id_of', 'get_property',
+    'get_array'). The methods that take pitches have to hash the pitch for each call.
+    """
+
+    # properties that are precalculated for each pitch and their dtypes
+    _properties = (
+        ("normalized_id", int),
+        ("scale_degree", int),
+        ("instrument", object),
+        ("cents", float),
+        ("octave", int),
+        ("artifical_harmonic", object),
+    )
+
+    def __init__(self, pitches: tuple = tuple([])):
+        self._pitches = []
+        self._pitch2id = {}
+        self._values_per_property = {prop: [] for prop, _ in self._properties}
+        # arrays grow with the registry, so that interning new pitches doesn't
+        # invalidate them
+        self._array_per_property = {
+            prop: np.empty(64, dtype=dtype) for prop, dtype in self._properties
+        }
+        self._registered_pitches = {}
+
+        for pitch in globals_.INTONATIONS + tuple(pitches):
+            self.intern(pitch)
+
+    def __repr__(self) -> str:
+        return "PitchRegistry({} pitches)".format(len(self))
+
+    def __len__(self) -> int:
+        return len(self._pitches)
+
+    def __contains__(self, pitch) -> bool:
+        return pitch in self._pitch2id
+
+    def intern(self, pitch) -> int:
+        """Return id of a JIPitch (and register the pitch if it's unknown)."""
+        try:
+            return self._pitch2id[pitch]
+        except KeyError:
+            pass
+
+        normalized = pitch.normalize()
+        if normalized == pitch:
+            normalized_id = len(self._pitches)
+        else:
+            normalized_id = self.intern(normalized)
+
+        pitch_id = len(self._pitches)
+        self._pitches.append(pitch)
+        self._pitch2id.update({pitch: pitch_id})
+
+        if pitch_id == len(self._array_per_property["normalized_id"]):
+            for prop, array in tuple(self._array_per_property.items()):
+                self._array_per_property[prop] = np.concatenate(
+                    (array, np.empty(len(array), dtype=array.dtype))
+                )
+
+        for prop, value in (
+            ("normalized_id", normalized_id),
+            ("scale_degree", globals_.PITCH2SCALE_DEGREE.get(normalized, -1)),
+            ("instrument", globals_.PITCH2INSTRUMENT.get(normalized)),
+            ("cents", pitch.cents),
+            ("octave", pitch.octave),
+            ("artifical_harmonic", _ARTIFICAL_HARMONIC_PER_RATIO.get(normalized)),
+        ):
+            self._values_per_property[prop].append(value)
+            self._array_per_property[prop][pitch_id] = value
+
+        return pitch_id
+
+    def intern_many(self, pitches: tuple) -> np.ndarray:
+        return np.array(tuple(self.intern(pitch) for pitch in pitches), dtype=int)
+
+    def get_pitch(self, pitch_id: int):
+        return self._pitches[pitch_id]
+
+    def get_pitches(self, pitch_ids: tuple) -> tuple:
+        return tuple(self._pitches[pitch_id] for pitch_id in pitch_ids)
+
+    def get_array(self, prop: str) -> np.ndarray:
+        """Return values of a property for all ids (for vectorized algorithms).
+
+        Scale degrees of pitches that aren't part of the scale are -1, missing
+        instruments and artifical harmonics are None. The returned array is a view
+        that mustn't be changed.
+        """
+        return self._array_per_property[prop][: len(self._pitches)]
+
+    def get_property(self, prop: str, pitch_id: int) -> object:
+        """Return property of an interned pitch. Raise KeyError if it's missing."""
+        value = self._values_per_property[prop][pitch_id]
+        if value is None or (prop == "scale_degree" and value == -1):
+            raise KeyError("{} has no {}.".format(self._pitches[pitch_id], prop))
+        return value
+
+    def get_normalized_id_of(self, pitch_id: int) -> int:
+        return self._values_per_property["normalized_id"][pitch_id]
+
+    def get_normalized_id(self, pitch) -> int:
+        return self._values_per_property["normalized_id"][self.intern(pitch)]
+
+    def normalize(self, pitch):
+        """Return interned normalized version of a pitch."""
+        return self._pitches[self.get_normalized_id(pitch)]
+
+    def register(self, pitch, octave: int):
+        """Return interned version of the pitch in another octave."""
+        key = (self.get_normalized_id(pitch), octave)
+        try:
+            return self._registered_pitches[key]
+        except KeyError:
+            registered_pitch = self._pitches[self.intern(pitch.register(octave))]
+            self._registered_pitches.update({key: registered_pitch})
+            return registered_pitch
+
+    def get_scale_degree(self, pitch) -> int:
+        return self.get_property("scale_degree", self.intern(pitch))
+
+    def get_instrument(self, pitch) -> str:
+        return self.get_property("instrument", self.intern(pitch))
+
+    def get_cents(self, pitch) -> float:
+        return self._values_per_property["cents"][self.intern(pitch)]
+
+    def get_octave(self, pitch) -> int:
+        return self._values_per_property["octave"][self.intern(pitch)]
+
+    def get_artifical_harmonic(self, pitch) -> tuple:
+        """Return (pitch_class, octave) of the artifical harmonic of a pitch."""
+        return self.get_property("artifical_harmonic", self.intern(pitch))
+
+
+REGISTRY = PitchRegistry()
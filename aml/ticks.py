@@ -0,0 +1,95 @@
+"""Integer tick timebase for rhythmical hot paths.
+
+Adding and comparing quicktions.Fraction objects needs a gcd normalisation for each
+operation. Inside of loops that only compare or search positions, rhythms can instead
+be expressed as integer ticks on a grid whose resolution is the least common multiple
+of all denominators in use. Values are only converted back to Fraction objects where
+they leave the respective module (e.g. when they are passed to abjad or lily).
+
+Integer ticks are opt-in: they are used if the environment variable
+AML_INTEGER_TICKS is set to 1 or after calling 'enable'.
+"""
+
+import bisect
+import functools
+import math
+import os
+
+import quicktions as fractions
+
+
+_is_enabled = os.environ.get("AML_INTEGER_TICKS", "0") == "1"
+
+
+def enable(is_enabled: bool = True) -> None:
+    global _is_enabled
+    _is_enabled = is_enabled
+
+
+def is_enabled() -> bool:
+    return _is_enabled
+
+
+def _lcm(a: int, b: int) -> int:
+    return a * b // math.gcd(a, b)
+
+
+def find_resolution(values) -> int:
+    """Return least common multiple of the denominators of all values."""
+    return functools.reduce(
+        _lcm, (fractions.Fraction(value).denominator for value in values), 1
+    )
+
+
+class TickGrid(object):
+    """Convert between Fraction based positions and integer ticks."""
+
+    __slots__ = ("_resolution",)
+
+    def __init__(self, resolution: int):
+        self._resolution = resolution
+
+    def __repr__(self) -> str:
+        return "TickGrid({})".format(self.resolution)
+
+    @classmethod
+    def from_values(cls, values) -> "TickGrid":
+        return cls(find_resolution(values))
+
+    @property
+    def resolution(self) -> int:
+        return self._resolution
+
+    def to_ticks(self, value) -> int:
+        """Convert value to ticks. Raise ValueError if value isn't on the grid."""
+        ticks = fractions.Fraction(value) * self._resolution
+        if ticks.denominator != 1:
+            raise ValueError("{} isn't on {}.".format(value, self))
+        return ticks.numerator
+
+    def to_ticks_tuple(self, values) -> tuple:
+        return tuple(self.to_ticks(value) for value in values)
+
+    def to_fraction(self, ticks: int) -> fractions.Fraction:
+        return fractions.Fraction(ticks, self._resolution)
+
+    def floor(self, value) -> int:
+        """Return the biggest tick that is smaller or equal to value."""
+        return math.floor(fractions.Fraction(value) * self._resolution)
+
+    def ceil(self, value) -> int:
+        """Return the smallest tick that is bigger or equal to value."""
+        return math.ceil(fractions.Fraction(value) * self._resolution)
+
+    def find_first_index(self, sorted_ticks: tuple, value) -> int:
+        """Return index of the first tick that is bigger or equal to value."""
+        return bisect.bisect_left(sorted_ticks, self.ceil(value))
+
+    def find_index_range_between(
+        self, sorted_ticks: tuple, lower_bound, upper_bound
+    ) -> tuple:
+        """Return (start, stop) - indices of all ticks between both (exclusive) bounds."""
+        return (
+            bisect.bisect_right(sorted_ticks, self.floor(lower_bound)),
+            bisect.bisect_left(sorted_ticks, self.ceil(upper_bound)),
+        )
@@ -1,3 +1,15 @@
-from . import general
-from . import keyboard
-from . import strings
+import importlib
+
+# submodules are only imported when they are accessed for the first time (PEP 562)
+__all__ = ("general", "keyboard", "strings")
+
+
+def __getattr__(name: str):
+    if name in __all__:
+        return importlib.import_module("{}.{}".format(__name__, name))
+
+    raise AttributeError("module '{}' has no attribute '{}'".format(__name__, name))
+
+
+def __dir__() -> list:
+    return sorted(set(globals()).union(__all__))
@@ -1,6 +1,9 @@
+import contextlib
+
 import quicktions as fractions
 
 import abjad
+import pyo
 
 from mu.utils import tools
 
@@ -10,6 +13,43 @@ from mutools import synthesis
 from aml import globals_
 
 
+# offline pyo servers are only created when the first render needs them. there is
+# always maximal one server per channel count, which gets rebooted for each new render.
+_OFFLINE_PYO_SERVER_PER_N_CHANNELS = {}
+
+
+def get_offline_pyo_server(nchnls: int) -> pyo.Server:
+    try:
+        server = _OFFLINE_PYO_SERVER_PER_N_CHANNELS[nchnls]
+    except KeyError:
+        server = pyo.Server(sr=44100, audio="offline", nchnls=nchnls)
+        _OFFLINE_PYO_SERVER_PER_N_CHANNELS.update({nchnls: server})
+
+    return server
+
+
+@contextlib.contextmanager
+def offline_pyo_server(nchnls: int, duration: float, filename: str) -> pyo.Server:
+    """Boot shared offline server, render to filename on exit & shut it down again.
+
+    Pyo objects have to be initialised inside the with statement, so that they are
+    assigned to the booted server.
+    """
+    for other_server in _OFFLINE_PYO_SERVER_PER_N_CHANNELS.values():
+        if other_server.getIsBooted():
+            other_server.shutdown()
+
+    server = get_offline_pyo_server(nchnls)
+    server.setServer()
+    server.boot()
+    server.recordOptions(dur=duration, filename=filename, sampletype=4)
+    try:
+        yield server
+        server.start()
+    finally:
+        server.shutdown()
+
+
 class AMLTrack(mus.Track):
     format = globals_.FORMAT
 
@@ -26,9 +26,11 @@ from mutools import lily
 from mutools import mus
 from mutools import synthesis
 
+from aml import caching
 from aml import complex_meters
 from aml import comprovisation
 from aml import globals_
+from aml import pitch_registry
 
 from aml.trackmaker import general
 
@@ -206,11 +208,63 @@ def _generate_keyboard_midi_note2ji_pitch_mapping_for_gong_zone(
     midi_note2ji_pitch_mapping_per_zone.update({"gong": midi_pitch2ji_pitch})
 
 
-MIDI_NOTE2JI_PITCH_PER_ZONE = _generate_keyboard_midi_note2ji_pitch_mapping()
-_generate_keyboard_midi_note2ji_pitch_mapping_for_gong_zone(MIDI_NOTE2JI_PITCH_PER_ZONE)
+@functools.lru_cache(maxsize=1)
+def get_midi_note2ji_pitch_per_zone() -> dict:
+    """Return {zone_name: {midi_note: ji_pitch}} (computed on first call)."""
+    midi_note2ji_pitch_per_zone = _generate_keyboard_midi_note2ji_pitch_mapping()
+    _generate_keyboard_midi_note2ji_pitch_mapping_for_gong_zone(
+        midi_note2ji_pitch_per_zone
+    )
+    return midi_note2ji_pitch_per_zone
+
+
+@functools.lru_cache(maxsize=1)
+def get_keyboard_ratio2abjad_pitch_per_zone() -> dict:
+    """Return {zone_name: {ji_pitch: abjad_pitch}} (computed on first call)."""
+    return {
+        zone_name: {
+            (
+                REAL_GONG_PITCH2SYMBOLIC_GONG_PITCH[ratio]
+                if zone_name == "gong"
+                else ratio
+            ): globals_.MIDI_PITCH2ABJAD_PITCH[midi_note]
+            for midi_note, ratio in zone.items()
+        }
+        for zone_name, zone in get_midi_note2ji_pitch_per_zone().items()
+    }
+
+
+@functools.lru_cache(maxsize=1)
+def get_gong_ji_pitch2index() -> dict:
+    """Return {ji_pitch: sample_index} of the gong zone (computed on first call)."""
+    return {
+        value: key - LOWEST_MIDI_NOTE
+        for key, value in get_midi_note2ji_pitch_per_zone()["gong"].items()
+    }
+
+
+# both mappings are only calculated as soon as they are accessed the first time
+_LAZY_ATTRIBUTE2GETTER = {
+    "MIDI_NOTE2JI_PITCH_PER_ZONE": get_midi_note2ji_pitch_per_zone,
+    "KEYBOARD_RATIO2ABJAD_PITCH_PER_ZONE": get_keyboard_ratio2abjad_pitch_per_zone,
+}
+
 
+def __getattr__(name: str):
+    try:
+        return _LAZY_ATTRIBUTE2GETTER[name]()
+    except KeyError:
+        raise AttributeError("module '{}' has no attribute '{}'".format(__name__, name))
+
+
+def generate_keyboard_mapping_files() -> None:
+    """Write mapping files for the live electronics to KEYBOARD_SETUP_PATH.
+
+    Files are only rewritten if their content changed.
+    """
+
+    midi_note2ji_pitch_per_zone = get_midi_note2ji_pitch_per_zone()
 
-def _generate_keyboard_mapping_files():
     def gen_right_hand_mapping():
         _right_hand_mapping_path = (
             "{}/midi_note2freq_and_instrument_mapping.json".format(KEYBOARD_SETUP_PATH)
@@ -219,12 +273,11 @@ def _generate_keyboard_mapping_files():
         data = {
             midi_note: (
                 float(jipitch) * globals_.CONCERT_PITCH,
-                globals_.PITCH2INSTRUMENT[jipitch.normalize()],
+                pitch_registry.REGISTRY.get_instrument(jipitch),
             )
-            for midi_note, jipitch in MIDI_NOTE2JI_PITCH_PER_ZONE["sine"].items()
+            for midi_note, jipitch in midi_note2ji_pitch_per_zone["sine"].items()
         }
-        with open(_right_hand_mapping_path, "w") as f:
-            json.dump(data, f)
+        caching.write_if_changed(_right_hand_mapping_path, json.dumps(data).encode())
 
     def gen_left_hand_mapping():
         # generate scl file ... kbm file has been written by hand and has to adapted
@@ -232,51 +285,38 @@ def _generate_keyboard_mapping_files():
         scl_f_name = "pteq.scl"
         _left_hand_mapping_path = "{}/{}".format(KEYBOARD_SETUP_PATH, scl_f_name)
 
-        rising_pitches = tuple(sorted(MIDI_NOTE2JI_PITCH_PER_ZONE["pianoteq"].values()))
+        rising_pitches = tuple(sorted(midi_note2ji_pitch_per_zone["pianoteq"].values()))
         first_ct = rising_pitches[0].cents
         cent_values = tuple(p.cents - first_ct for p in rising_pitches[1:]) + (3600,)
-        with open(_left_hand_mapping_path, "w") as f:
-            f.write(
-                "\n".join(
-                    (
-                        "! {}".format(scl_f_name),
-                        "!",
-                        " 21 pitches uneven distributed on 3 octaves.",
-                        " 36",
-                        "!\n",
-                    )
-                )
+        content = "\n".join(
+            (
+                "! {}".format(scl_f_name),
+                "!",
+                " 21 pitches uneven distributed on 3 octaves.",
+                " 36",
+                "!\n",
             )
-            for ct in cent_values:
-                f.write("{}\n".format(ct))
+        )
+        content += "".join("{}\n".format(ct) for ct in cent_values)
+        caching.write_if_changed(_left_hand_mapping_path, content.encode())
+
+    def gen_midi_note2ji_ratio_mapping():
+        # make a general file for saving midi-tone => ji.Pitch
+        data = {}
+        for zone, zone_data in midi_note2ji_pitch_per_zone.items():
+            for midi_note, ji_pitch in zone_data.items():
+                data.update(
+                    {int(midi_note): (ji_pitch.numerator, ji_pitch.denominator)}
+                )
+
+        caching.write_if_changed(
+            "{}/midi-note2ji-ratio.json".format(KEYBOARD_SETUP_PATH),
+            json.dumps(data).encode(),
+        )
 
     gen_right_hand_mapping()
     gen_left_hand_mapping()
-
-
-_generate_keyboard_mapping_files()
-
-
-KEYBOARD_RATIO2ABJAD_PITCH_PER_ZONE = {
-    zone_name: {
-        (
-            REAL_GONG_PITCH2SYMBOLIC_GONG_PITCH[ratio] if zone_name == "gong" else ratio
-        ): globals_.MIDI_PITCH2ABJAD_PITCH[midi_note]
-        for midi_note, ratio in zone.items()
-    }
-    for zone_name, zone in MIDI_NOTE2JI_PITCH_PER_ZONE.items()
-}
-
-
-# make a general file for saving midi-tone => ji.Pitch
-MIDI_NOTE2JI_PITCH_PER_ZONE
-with open('{}/midi-note2ji-ratio.json'.format(KEYBOARD_SETUP_PATH), 'w') as f:
-    data = {}
-    for zone, zone_data in MIDI_NOTE2JI_PITCH_PER_ZONE.items():
-        for midi_note, ji_pitch in zone_data.items():
-            data.update({int(midi_note): (ji_pitch.numerator, ji_pitch.denominator)})
-
-    json.dump(data, f)
+    gen_midi_note2ji_ratio_mapping()
 
 
 class Keyboard(general.AMLTrack):
@@ -357,11 +397,6 @@ class VeryLeftHandKeyboardEngine(synthesis.BasedCsoundEngine):
     # print_output = True
     # remove_files = False
 
-    ji_pitch2index = {
-        value: key - LOWEST_MIDI_NOTE
-        for key, value in MIDI_NOTE2JI_PITCH_PER_ZONE["gong"].items()
-    }
-
     cname = ".gong"
 
     kempul_samples_path = "aml/electronics/kempul_samples"
@@ -389,6 +424,10 @@ class VeryLeftHandKeyboardEngine(synthesis.BasedCsoundEngine):
 
         self._novent_line = novent_line
 
+    @property
+    def ji_pitch2index(self) -> dict:
+        return get_gong_ji_pitch2index()
+
     @property
     def orc(self) -> str:
         lines = (
@@ -563,45 +602,42 @@ class RightHandKeyboardEngine(synthesis.PyoEngine):
         return myinstr
 
     def render(self, name: str) -> None:
-        globals_.PYO_SERVER = pyo.Server(sr=44100, audio="offline", nchnls=3)
-        globals_.PYO_SERVER.boot()
-        globals_.PYO_SERVER.recordOptions(
-            dur=self.duration + self._tail + 1,
-            filename="{}.wav".format(name),
-            sampletype=4,
-        )
-        events = pyo.Events(
-            instr=self.instrument,
-            freqs=pyo.EventSeq(
-                [
-                    [float(p) * globals_.CONCERT_PITCH for p in pitch] if pitch else []
-                    for pitch in self._novent_line.pitch
-                ],
-                occurrences=1,
-            ),
-            dur=pyo.EventSeq([float(d) for d in self._novent_line.delay]),
-            vol=pyo.EventSeq(
-                [float(vol) if vol else 1 for vol in self._novent_line.volume]
-            ),
-            chnl=pyo.EventSeq(
-                [
+        with general.offline_pyo_server(
+            3, self.duration + self._tail + 1, "{}.wav".format(name)
+        ):
+            events = pyo.Events(
+                instr=self.instrument,
+                freqs=pyo.EventSeq(
                     [
-                        self._instrument2channel_mapping[
-                            globals_.PITCH2INSTRUMENT[p.normalize()]
+                        [float(p) * globals_.CONCERT_PITCH for p in pitch]
+                        if pitch
+                        else []
+                        for pitch in self._novent_line.pitch
+                    ],
+                    occurrences=1,
+                ),
+                dur=pyo.EventSeq([float(d) for d in self._novent_line.delay]),
+                vol=pyo.EventSeq(
+                    [float(vol) if vol else 1 for vol in self._novent_line.volume]
+                ),
+                chnl=pyo.EventSeq(
+                    [
+                        [
+                            self._instrument2channel_mapping[
+                                pitch_registry.REGISTRY.get_instrument(p)
+                            ]
+                            for p in pitch
                         ]
-                        for p in pitch
-                    ]
-                    if pitch
-                    else []
-                    for pitch in self._novent_line.pitch
-                ],
-                occurrences=1,
-            ),
-            outs=3,
-        )
-        events.play()
-        events.stop(wait=self.duration)
-        globals_.PYO_SERVER.start()
+                        if pitch
+                        else []
+                        for pitch in self._novent_line.pitch
+                    ],
+                    occurrences=1,
+                ),
+                outs=3,
+            )
+            events.play()
+            events.stop(wait=self.duration)
 
 
 class KeyboardSoundEngine(synthesis.SoundEngine):
@@ -709,12 +745,13 @@ class KeyboardMaker(SilentKeyboardMaker):
         staves = []
         staves_for_midi_render = abjad.StaffGroup([])
 
+        keyboard_ratio2abjad_pitch_per_zone = get_keyboard_ratio2abjad_pitch_per_zone()
         left_hand_keyboard_ratio2abjad_pitch = {}
         left_hand_keyboard_ratio2abjad_pitch.update(
-            KEYBOARD_RATIO2ABJAD_PITCH_PER_ZONE["pianoteq"]
+            keyboard_ratio2abjad_pitch_per_zone["pianoteq"]
         )
         left_hand_keyboard_ratio2abjad_pitch.update(
-            KEYBOARD_RATIO2ABJAD_PITCH_PER_ZONE["gong"]
+            keyboard_ratio2abjad_pitch_per_zone["gong"]
         )
 
         # depending on the particular sub-staff the ratio2pitch_class_dict and the
@@ -723,7 +760,7 @@ class KeyboardMaker(SilentKeyboardMaker):
             self._prepare_staves(self.musdat, self._segment_maker),
             (
                 self.ratio2pitchclass_dict,
-                KEYBOARD_RATIO2ABJAD_PITCH_PER_ZONE["sine"],
+                keyboard_ratio2abjad_pitch_per_zone["sine"],
                 left_hand_keyboard_ratio2abjad_pitch,
             ),
             (
@@ -919,17 +956,21 @@ class KeyboardMaker(SilentKeyboardMaker):
     def _mlh_detect_absolute_scale_degree(
         cls, pitch: ji.JIPitch, relative_ground_octave: int
     ) -> int:
-        normalized_pitch = pitch.normalize()
-        relative_scale_degree = globals_.PITCH2SCALE_DEGREE[normalized_pitch]
-        pitch_octave = pitch.octave
+        # each pitch is only interned once, all properties are looked up by its id
+        registry = pitch_registry.REGISTRY
+        pitch_id = registry.intern(pitch)
+        relative_scale_degree = registry.get_property("scale_degree", pitch_id)
+        pitch_octave = registry.get_property("octave", pitch_id)
 
         # remove error occuring from weird intonation for first scale degree where
         # octave is returning a false value
-        if normalized_pitch == cls._normalized_unusual_first_pitch:
+        if registry.get_normalized_id_of(pitch_id) == registry.intern(
+            cls._normalized_unusual_first_pitch
+        ):
             pitch_octave += 1
 
         absolute_scale_degree = relative_scale_degree + (
-            (pitch.octave - relative_ground_octave) * 7
+            (registry.get_property("octave", pitch_id) - relative_ground_octave) * 7
         )
         return int(absolute_scale_degree)
 
@@ -938,18 +979,21 @@ class KeyboardMaker(SilentKeyboardMaker):
         cls, pitch0: ji.JIPitch, pitch1: ji.JIPitch
     ) -> tuple:
 
-        p0_normalized, p1_normalized = pitch0.normalize(), pitch1.normalize()
+        # each pitch is only interned once, all properties are looked up by its id
+        registry = pitch_registry.REGISTRY
+        pitch_ids = (registry.intern(pitch0), registry.intern(pitch1))
 
         scale_degrees = tuple(
-            globals_.PITCH2SCALE_DEGREE[p] for p in (p0_normalized, p1_normalized)
+            registry.get_property("scale_degree", pitch_id) for pitch_id in pitch_ids
         )
 
-        octaves = [p.octave for p in (pitch0, pitch1)]
+        octaves = [registry.get_property("octave", pitch_id) for pitch_id in pitch_ids]
 
         # remove error occuring from weird intonation for first scale degree where
         # octave is returning a false value
-        for idx, p in enumerate((p0_normalized, p1_normalized)):
-            if p == cls._normalized_unusual_first_pitch:
+        unusual_first_pitch_id = registry.intern(cls._normalized_unusual_first_pitch)
+        for idx, pitch_id in enumerate(pitch_ids):
+            if registry.get_normalized_id_of(pitch_id) == unusual_first_pitch_id:
                 octaves[idx] += 1
 
         min_oct = min(octaves)
@@ -1495,7 +1539,9 @@ class KeyboardMaker(SilentKeyboardMaker):
             colotomic_structure[0] = 1
             colotomic_structure = tuple(colotomic_structure)
 
-        available_gong_pitches = tuple(MIDI_NOTE2JI_PITCH_PER_ZONE["gong"].values())
+        available_gong_pitches = tuple(
+            get_midi_note2ji_pitch_per_zone()["gong"].values()
+        )
         absolute_bar_positions = tools.accumulate_from_zero(
             tuple(float(b.duration) for b in segment_maker.bars)
         )[:-1]
@@ -1661,7 +1707,7 @@ class KeyboardMaker(SilentKeyboardMaker):
         )
 
         available_pitches_for_left_hand = tuple(
-            KEYBOARD_RATIO2ABJAD_PITCH_PER_ZONE["pianoteq"].keys()
+            get_keyboard_ratio2abjad_pitch_per_zone()["pianoteq"].keys()
         )
 
         # available pitch classes per mandatory beat
@@ -1764,7 +1810,7 @@ class KeyboardMaker(SilentKeyboardMaker):
         nset = lily.NOventSet(size=segment_maker.duration)
 
         available_pitches_for_right_hand = tuple(
-            KEYBOARD_RATIO2ABJAD_PITCH_PER_ZONE["sine"].keys()
+            get_keyboard_ratio2abjad_pitch_per_zone()["sine"].keys()
         )
         for area in segment_maker.areas:
             if not area.pitch.is_empty:
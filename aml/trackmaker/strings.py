@@ -8,6 +8,7 @@ The expected sample paths are
 """
 
 import abc
+import concurrent.futures
 import functools
 import itertools
 import numpy as np
@@ -39,9 +40,11 @@ from mutools import mus
 from mutools import synthesis
 
 from aml import areas
+from aml import caching
 from aml import complex_meters
 from aml import comprovisation
 from aml import globals_
+from aml import pitch_registry
 from aml import tweaks
 
 from aml.trackmaker import general
@@ -130,76 +133,140 @@ class Sample(object):
         )
 
 
-def _make_samples(sample_paths: tuple) -> tuple:
-    samples = []
+def _detect_sample_frequency(sample_path: str) -> float:
+    """Return frequency of a sample and save it in a json file next to the sample.
 
-    pitch_analyser = samplyser.Analyser(samplyser.pitch.detector.freq_from_hps)
+    The json file also contains the modification time and size of the sample, so that
+    the frequency gets detected again if the sample has been replaced.
+    """
+    sample = os.path.basename(sample_path)
+    sample_json_path = "{}.json".format(sample_path[:-4])
+    stat = os.stat(sample_path)
+
+    try:
+        with open(sample_json_path, "r") as f:
+            sample_data = json.load(f)
+    except (OSError, ValueError):
+        sample_data = {}
+
+    if (
+        sample_path not in sample_data
+        or sample_data.get("mtime") != stat.st_mtime
+        or sample_data.get("size") != stat.st_size
+    ):
+        if "pizz" in sample.lower():
+            split_sample_name = sample.split("_")
+            pitch_name = split_sample_name[2].lower()
+            frequency = abjad.NamedPitch(pitch_name).hertz
+
+        else:
+            pitch_analyser = samplyser.Analyser(samplyser.pitch.detector.freq_from_hps)
+            pitch_analyser(sample_path, output=True)
+            with open(sample_json_path, "r") as f:
+                frequency = json.load(f)[sample_path][0]
+
+        sample_data = {
+            sample_path: [frequency],
+            "mtime": stat.st_mtime,
+            "size": stat.st_size,
+        }
+        caching.atomic_write(sample_json_path, json.dumps(sample_data).encode())
+
+    return sample_data[sample_path][0]
+
+
+def _detect_sample_dynamic(sample: str) -> int:
+    try:
+        dynamic = sample.split("_")[3].split(".")[0]
+        if dynamic in ("p", "v1"):
+            return 0
+        else:
+            return 1
+    except IndexError:
+        return 0
+
+
+def _make_samples(sample_paths: tuple, index_path: str, jobs: int = 1) -> tuple:
+    """Load samples from the sample index and update the index if necessary.
+
+    Only samples which are new or whose modification time or size changed since the
+    last call get analysed again (in 'jobs' parallel processes).
+    """
+
+    try:
+        with open(index_path, "r") as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        index = {}
+
+    new_index = {}
+    sample_paths2analyse = []
     for instrument_path in sample_paths:
         for playing_technique in os.listdir(instrument_path):
             instrument_and_playing_technique_path = "{}/{}".format(
                 instrument_path, playing_technique
             )
-            files = os.listdir(instrument_and_playing_technique_path)
-            for sample in files:
-                if sample[-3:] == "wav":
-                    sample_name_without_path = sample[:-4]
-                    sample_json_name = "{}.json".format(sample_name_without_path)
-
+            for entry in os.scandir(instrument_and_playing_technique_path):
+                if entry.name[-3:] == "wav":
                     complete_sample_path = "{}/{}".format(
-                        instrument_and_playing_technique_path, sample
+                        instrument_and_playing_technique_path, entry.name
                     )
-                    complete_sample_json_path = "{}/{}".format(
-                        instrument_and_playing_technique_path, sample_json_name
-                    )
-
-                    if sample_json_name not in files:
-                        if "pizz" in sample.lower():
-                            split_sample_name = sample.split("_")
-                            pitch_name = split_sample_name[2].lower()
-                            frequency = abjad.NamedPitch(pitch_name).hertz
-                            with open(complete_sample_json_path, "w") as f:
-                                json.dump({complete_sample_path: [frequency]}, f)
-
-                        else:
-                            pitch_analyser(complete_sample_path, output=True)
+                    stat = entry.stat()
+                    item = index.get(complete_sample_path)
+                    if (
+                        item is None
+                        or item["mtime"] != stat.st_mtime
+                        or item["size"] != stat.st_size
+                    ):
+                        item = {
+                            "path": complete_sample_path,
+                            "frequency": None,
+                            "dynamic": _detect_sample_dynamic(entry.name),
+                            "playing_technique": playing_technique.lower(),
+                            "mtime": stat.st_mtime,
+                            "size": stat.st_size,
+                        }
+                        sample_paths2analyse.append(complete_sample_path)
+
+                    new_index.update({complete_sample_path: item})
+
+    if sample_paths2analyse:
+        if jobs > 1:
+            with concurrent.futures.ProcessPoolExecutor(jobs) as executor:
+                frequencies = tuple(
+                    executor.map(_detect_sample_frequency, sample_paths2analyse)
+                )
+        else:
+            frequencies = tuple(map(_detect_sample_frequency, sample_paths2analyse))
 
-                    frequency = json.load(open(complete_sample_json_path, "r"))[
-                        complete_sample_path
-                    ][0]
+        for sample_path, frequency in zip(sample_paths2analyse, frequencies):
+            new_index[sample_path]["frequency"] = frequency
 
-                    try:
-                        dynamic = sample.split("_")[3].split(".")[0]
-                        if dynamic in ("p", "v1"):
-                            dynamic = 0
-                        else:
-                            dynamic = 1
-                    except IndexError:
-                        dynamic = 0
-
-                    samples.append(
-                        Sample(
-                            complete_sample_path,
-                            frequency,
-                            dynamic,
-                            playing_technique.lower(),
-                        )
-                    )
+    if new_index != index:
+        caching.atomic_write(index_path, json.dumps(new_index).encode())
 
-    return tuple(samples)
+    return tuple(
+        Sample(
+            item["path"], item["frequency"], item["dynamic"], item["playing_technique"]
+        )
+        for item in new_index.values()
+    )
 
 
 class SampleBasedStringSoundEngine(object):
-    _samples = _make_samples(
-        tuple(
-            "{}/{}".format(os.path.expanduser("~"), path)
-            for path in (
-                ".local/share/sounds/Solo_Contrabass",
-                ".local/share/sounds/Solo_Violin",
-                # ".local/share/sounds/Cello_Section",
-                # ".local/share/sounds/Viola_Section",
-            )
+    _sample_paths = tuple(
+        "{}/{}".format(os.path.expanduser("~"), path)
+        for path in (
+            ".local/share/sounds/Solo_Contrabass",
+            ".local/share/sounds/Solo_Violin",
+            # ".local/share/sounds/Cello_Section",
+            # ".local/share/sounds/Viola_Section",
         )
     )
+    _sample_index_path = "{}/string_samples.json".format(globals_.CACHE_PATH)
+
+    # samples are only loaded as soon as they are needed for the first time
+    _samples = None
 
     def __init__(self, novent_line: lily.NOventLine):
         self._novent_line = comprovisation.process_comprovisation_attachments(
@@ -249,9 +316,20 @@ class SampleBasedStringSoundEngine(object):
 
         return tuple(samples)
 
+    @classmethod
+    def load_samples(cls, jobs: int = 1) -> tuple:
+        """(Re-)load all samples and analyse new samples with n parallel jobs."""
+        SampleBasedStringSoundEngine._samples = _make_samples(
+            cls._sample_paths, cls._sample_index_path, jobs
+        )
+        return SampleBasedStringSoundEngine._samples
+
     @property
     def samples(self) -> tuple:
-        return self._samples
+        if SampleBasedStringSoundEngine._samples is None:
+            return self.load_samples()
+
+        return SampleBasedStringSoundEngine._samples
 
 
 class SampleBasedStringSoundEngineCsound(
@@ -399,150 +477,145 @@ class SampleBasedStringSoundEnginePyo(
         return globals_.CONCERT_PITCH
 
     def render(self, name: str) -> None:
-        globals_.PYO_SERVER = pyo.Server(sr=44100, audio="offline", nchnls=1)
-        globals_.PYO_SERVER.boot()
-        globals_.PYO_SERVER.recordOptions(
-            dur=self.duration + self._tail + 1,
-            filename="{}.wav".format(name),
-            sampletype=4,
-        )
-        samples_per_attack = []
-        pitch_lines_per_attack = []
-        ornamentation_lines_per_attack = []
-        volume_per_attack = []
-        duration_per_attack = []
-
-        nth = 0
-        for novent in self._novent_line:
-            duration = float(novent.delay)
-            if novent.pitch:
-                n_glissando_point = (
-                    len(novent.glissando.pitch_line) if novent.glissando else 0
-                )
-                sample, expected_freq = self.find_samples(novent)[0]
-                volume = novent.volume
-                if not volume:
-                    volume = 1
+        with general.offline_pyo_server(
+            1, self.duration + self._tail + 1, "{}.wav".format(name)
+        ):
+            samples_per_attack = []
+            pitch_lines_per_attack = []
+            ornamentation_lines_per_attack = []
+            volume_per_attack = []
+            duration_per_attack = []
+
+            nth = 0
+            for novent in self._novent_line:
+                duration = float(novent.delay)
+                if novent.pitch:
+                    n_glissando_point = (
+                        len(novent.glissando.pitch_line) if novent.glissando else 0
+                    )
+                    sample, expected_freq = self.find_samples(novent)[0]
+                    volume = novent.volume
+                    if not volume:
+                        volume = 1
 
-                else:
-                    volume = float(volume)
+                    else:
+                        volume = float(volume)
 
-                pitch_factor = expected_freq / sample.freq
+                    pitch_factor = expected_freq / sample.freq
 
-                if n_glissando_point == 0:
-                    pitch_line = [(0, pitch_factor), (duration, pitch_factor)]
+                    if n_glissando_point == 0:
+                        pitch_line = [(0, pitch_factor), (duration, pitch_factor)]
 
-                else:
-                    time_position_per_point = tools.accumulate_from_zero(
-                        tuple(float(pi.delay) for pi in novent.glissando.pitch_line)[
-                            :-1
-                        ]
-                    )
-                    pitch_factor_per_point = tuple(
-                        (float(pi.pitch + novent.pitch[0]) * globals_.CONCERT_PITCH)
-                        / sample.freq
-                        for pi in novent.glissando.pitch_line
-                    )
+                    else:
+                        time_position_per_point = tools.accumulate_from_zero(
+                            tuple(
+                                float(pi.delay) for pi in novent.glissando.pitch_line
+                            )[:-1]
+                        )
+                        pitch_factor_per_point = tuple(
+                            (float(pi.pitch + novent.pitch[0]) * globals_.CONCERT_PITCH)
+                            / sample.freq
+                            for pi in novent.glissando.pitch_line
+                        )
 
-                    pitch_line = list(
-                        zip(time_position_per_point, pitch_factor_per_point)
-                    )
+                        pitch_line = list(
+                            zip(time_position_per_point, pitch_factor_per_point)
+                        )
 
-                sample_path = os.path.relpath(sample.path)
+                    sample_path = os.path.relpath(sample.path)
 
-                if novent.ornamentation:
-                    if type(novent.ornamentation) == attachments.OrnamentationUp:
-                        factor = 1.049
-                    else:
-                        factor = 0.954
+                    if novent.ornamentation:
+                        if type(novent.ornamentation) == attachments.OrnamentationUp:
+                            factor = 1.049
+                        else:
+                            factor = 0.954
 
-                    ornamentation_line = [(0, 1)]
+                        ornamentation_line = [(0, 1)]
 
-                    perc_margin = 0.16
-                    area = duration * perc_margin
-                    area = area, duration - area
-                    distance = (area[1] - area[0]) / novent.ornamentation.n_times
-                    point_positions = tuple(
-                        area[0] + (distance * n)
-                        for n in range(novent.ornamentation.n_times)
-                    )
+                        perc_margin = 0.16
+                        area = duration * perc_margin
+                        area = area, duration - area
+                        distance = (area[1] - area[0]) / novent.ornamentation.n_times
+                        point_positions = tuple(
+                            area[0] + (distance * n)
+                            for n in range(novent.ornamentation.n_times)
+                        )
 
-                    for position in point_positions:
-                        ornamentation_line.append((position, 1))
-                        ornamentation_line.append((position + 0.025, factor))
-                        ornamentation_line.append((position + 0.092, factor))
-                        ornamentation_line.append((position + 0.124, 1))
+                        for position in point_positions:
+                            ornamentation_line.append((position, 1))
+                            ornamentation_line.append((position + 0.025, factor))
+                            ornamentation_line.append((position + 0.092, factor))
+                            ornamentation_line.append((position + 0.124, 1))
 
-                    ornamentation_line.append((duration, 1))
+                        ornamentation_line.append((duration, 1))
 
+                    else:
+                        ornamentation_line = [(0, 1), (duration, 1)]
                 else:
-                    ornamentation_line = [(0, 1), (duration, 1)]
-            else:
-                sample_path = None
-                pitch_line = None
-                volume = None
-                ornamentation_line = None
-
-            samples_per_attack.append(sample_path)
-            pitch_lines_per_attack.append(pitch_line)
-            ornamentation_lines_per_attack.append(ornamentation_line)
-            volume_per_attack.append(volume)
-            duration_per_attack.append(duration)
-
-        absolute_time_values = tools.accumulate_from_zero(duration_per_attack)
-        for start, dur, volume, pitch_list, ornamentation_list, sample in zip(
-            absolute_time_values,
-            duration_per_attack,
-            volume_per_attack,
-            ornamentation_lines_per_attack,
-            pitch_lines_per_attack,
-            samples_per_attack,
-        ):
-            if sample is not None:
-                vol_env_name = "vol_env{}".format(nth)
-                pitch_env_name = "pitch_env{}".format(nth)
-                ornamentation_env_name = "ornamentation_env{}".format(nth)
-                sf_name = "sf_{}".format(nth)
-
-                if "pizz" in sample.lower():
-                    dur = 10
-                    loop = False
-                else:
-                    loop = True
+                    sample_path = None
+                    pitch_line = None
+                    volume = None
+                    ornamentation_line = None
+
+                samples_per_attack.append(sample_path)
+                pitch_lines_per_attack.append(pitch_line)
+                ornamentation_lines_per_attack.append(ornamentation_line)
+                volume_per_attack.append(volume)
+                duration_per_attack.append(duration)
+
+            absolute_time_values = tools.accumulate_from_zero(duration_per_attack)
+            for start, dur, volume, pitch_list, ornamentation_list, sample in zip(
+                absolute_time_values,
+                duration_per_attack,
+                volume_per_attack,
+                ornamentation_lines_per_attack,
+                pitch_lines_per_attack,
+                samples_per_attack,
+            ):
+                if sample is not None:
+                    vol_env_name = "vol_env{}".format(nth)
+                    pitch_env_name = "pitch_env{}".format(nth)
+                    ornamentation_env_name = "ornamentation_env{}".format(nth)
+                    sf_name = "sf_{}".format(nth)
+
+                    if "pizz" in sample.lower():
+                        dur = 10
+                        loop = False
+                    else:
+                        loop = True
 
-                setattr(
-                    self, vol_env_name, pyo.Fader(fadein=0.1, fadeout=0.1, dur=dur),
-                )
-                setattr(self, pitch_env_name, pyo.Linseg(pitch_list, loop=False))
-                setattr(
-                    self,
-                    ornamentation_env_name,
-                    pyo.Linseg(ornamentation_list, loop=False),
-                )
-                setattr(
-                    self,
-                    sf_name,
-                    pyo.SfPlayer(
-                        sample,
-                        speed=getattr(self, pitch_env_name)
-                        * getattr(self, ornamentation_env_name),
-                        loop=loop,
-                        mul=getattr(self, vol_env_name) * volume * 0.675,
-                        interp=4,
-                    ),
-                )
-                getattr(self, sf_name).out(chnl=0, delay=start, dur=dur)
-                getattr(self, ornamentation_env_name).play(delay=start, dur=dur)
-                getattr(self, pitch_env_name).play(delay=start, dur=dur)
-                getattr(self, vol_env_name).play(delay=start, dur=dur)
-                nth += 1
+                    setattr(
+                        self, vol_env_name, pyo.Fader(fadein=0.1, fadeout=0.1, dur=dur),
+                    )
+                    setattr(self, pitch_env_name, pyo.Linseg(pitch_list, loop=False))
+                    setattr(
+                        self,
+                        ornamentation_env_name,
+                        pyo.Linseg(ornamentation_list, loop=False),
+                    )
+                    setattr(
+                        self,
+                        sf_name,
+                        pyo.SfPlayer(
+                            sample,
+                            speed=getattr(self, pitch_env_name)
+                            * getattr(self, ornamentation_env_name),
+                            loop=loop,
+                            mul=getattr(self, vol_env_name) * volume * 0.675,
+                            interp=4,
+                        ),
+                    )
+                    getattr(self, sf_name).out(chnl=0, delay=start, dur=dur)
+                    getattr(self, ornamentation_env_name).play(delay=start, dur=dur)
+                    getattr(self, pitch_env_name).play(delay=start, dur=dur)
+                    getattr(self, vol_env_name).play(delay=start, dur=dur)
+                    nth += 1
 
-        self.freeverb = pyo.Freeverb(
-            sum([getattr(self, "sf_{}".format(i)) for i in range(nth - 1)]),
-            size=0.7,
-            mul=0.5,
-        ).out()
-        globals_.PYO_SERVER.start()
+            self.freeverb = pyo.Freeverb(
+                sum([getattr(self, "sf_{}".format(i)) for i in range(nth - 1)]),
+                size=0.7,
+                mul=0.5,
+            ).out()
 
 
 class PMStringSoundEngine(synthesis.BasedCsoundEngine):
@@ -726,9 +799,7 @@ class StringMaker(general.AMLTrackMaker):
         (
             added_pitch_class,
             octave_change,
-        ) = globals_.RATIO2ARTIFICAL_HARMONIC_PITCHCLASS_AND_ARTIFICIAL_HARMONIC_OCTAVE[
-            pitch.normalize()
-        ]
+        ) = pitch_registry.REGISTRY.get_artifical_harmonic(pitch)
         added_pitch = abjad.NamedPitch(
             abjad.NamedPitchClass(added_pitch_class),
             octave=int(abjad_pitch.octave) + octave_change,
@@ -789,7 +860,7 @@ class HarmonicPitchArea(object):
         self.stop = stop
         self._slice_start = slice_start
         self._slice_stop = slice_stop
-        self._instrument = globals_.PITCH2INSTRUMENT[pitch.normalize()]
+        self._instrument = pitch_registry.REGISTRY.get_instrument(pitch)
         self._pitch = pitch
         self._spread_metrical_loop = spread_metrical_loop
 
@@ -0,0 +1,171 @@
+"""Compute all missing qiroah transcriptions in parallel.
+
+The transcriptions that are needed by a chapter are found by statically reading the
+VerseMaker calls of its composition modules (the modules aren't imported, because
+this would already build the verses). With '--all' the default transcription of each
+verse of the transcription manifest is added. Transcriptions that aren't cached yet
+are computed by a process pool and saved in the cache of the VerseMaker, so that later
+chapter builds don't have to wait for them.
+
+Usage (from the root of the repository):
+
+    python -m aml.transcribe [--all] [--jobs N] [--composition PATH ...]
+"""
+
+import argparse
+import ast
+import concurrent.futures
+import inspect
+import os
+import sys
+
+from aml import manifest
+from aml import transcriptions
+from aml import versemaker
+
+
+COMPOSITION_PATHS = ("aml/composition/al-hasyr",)
+
+# arguments of VerseMaker that are passed to the transcription
+_TRANSCRIPTION_ARGUMENTS = (
+    "chapter",
+    "verse",
+    "octave_of_first_pitch",
+    "use_full_scale",
+)
+
+
+def _get_default_arguments() -> dict:
+    parameters = inspect.signature(versemaker.VerseMaker).parameters
+    return {
+        argument: parameters[argument].default for argument in _TRANSCRIPTION_ARGUMENTS
+    }
+
+
+def _is_verse_maker_call(node: ast.AST) -> bool:
+    if isinstance(node, ast.Call):
+        if isinstance(node.func, ast.Attribute):
+            return node.func.attr == "VerseMaker"
+        if isinstance(node.func, ast.Name):
+            return node.func.id == "VerseMaker"
+    return False
+
+
+def find_composition_arguments(path: str) -> tuple:
+    """Return transcription arguments of all VerseMaker calls in a composition."""
+    arguments_per_call = []
+    for module_name in sorted(os.listdir(path)):
+        if not module_name.endswith(".py"):
+            continue
+
+        module_path = "{}/{}".format(path, module_name)
+        with open(module_path, "r") as f:
+            tree = ast.parse(f.read(), module_path)
+
+        for node in filter(_is_verse_maker_call, ast.walk(tree)):
+            keywords = {keyword.arg: keyword.value for keyword in node.keywords}
+            keywords.update(dict(zip(("chapter", "verse"), node.args)))
+
+            if "time_transcriber" in keywords:
+                print(
+                    "{}: skipped VerseMaker with custom time transcriber".format(
+                        module_path
+                    )
+                )
+                continue
+
+            arguments = _get_default_arguments()
+            try:
+                arguments.update(
+                    {
+                        argument: ast.literal_eval(keywords[argument])
+                        for argument in _TRANSCRIPTION_ARGUMENTS
+                        if argument in keywords
+                    }
+                )
+            except ValueError:
+                print(
+                    "{}: skipped VerseMaker with dynamic arguments".format(module_path)
+                )
+                continue
+
+            arguments_per_call.append(arguments)
+
+    return tuple(arguments_per_call)
+
+
+def find_manifest_arguments() -> tuple:
+    """Return default transcription arguments for all verses of the manifest."""
+    arguments_per_verse = []
+    for chapter, verse in manifest.available_verses():
+        arguments = _get_default_arguments()
+        arguments.update(
+            {
+                "chapter": int(chapter),
+                "verse": int(verse) if verse.isdigit() else verse,
+            }
+        )
+        arguments_per_verse.append(arguments)
+    return tuple(arguments_per_verse)
+
+
+def _transcribe(arguments: dict) -> transcriptions.QiroahTranscription:
+    return transcriptions.QiroahTranscription.from_complex_scale(
+        time_transcriber=transcriptions.TimeTranscriber(), **arguments
+    )
+
+
+def transcribe(arguments_per_transcription: tuple, jobs: int = 1) -> tuple:
+    """Compute and cache all missing transcriptions.
+
+    Return the arguments of the transcriptions that have been computed.
+    """
+    missing = []
+    for arguments in arguments_per_transcription:
+        kwargs = dict(time_transcriber=transcriptions.TimeTranscriber(), **arguments)
+        if arguments not in missing and not (
+            versemaker.VerseMaker.has_cached_transcription(**kwargs)
+        ):
+            missing.append(arguments)
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = {
+            executor.submit(_transcribe, arguments): arguments for arguments in missing
+        }
+        for future in concurrent.futures.as_completed(futures):
+            arguments = futures[future]
+            versemaker.VerseMaker._store_transcription(
+                future.result(),
+                time_transcriber=transcriptions.TimeTranscriber(),
+                **arguments
+            )
+            print("transcribed {}".format(arguments))
+
+    return tuple(missing)
+
+
+def main(args: tuple = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--all", action="store_true", help="add all verses of the manifest"
+    )
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1)
+    parser.add_argument(
+        "--composition", nargs="*", default=COMPOSITION_PATHS, dest="compositions"
+    )
+    args = parser.parse_args(args)
+
+    arguments_per_transcription = []
+    for path in args.compositions:
+        arguments_per_transcription.extend(find_composition_arguments(path))
+
+    if args.all:
+        arguments_per_transcription.extend(find_manifest_arguments())
+
+    transcribed = transcribe(tuple(arguments_per_transcription), args.jobs)
+    print("computed {} missing transcriptions".format(len(transcribed)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
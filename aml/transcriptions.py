@@ -1,5 +1,6 @@
 import functools
 import math
+import numpy as np
 import operator
 import quicktions as fractions
 import pathlib
@@ -21,35 +22,82 @@ from mutools import bpm_extract
 from mutools import lily
 from mutools import quantizise
 
+from aml import audio
+from aml import caching
 from aml import complex_meters
 from aml import globals_
+from aml import ticks
+
+
+# fields of the notes of a SVL file (as saved by Tony)
+SVL_NOTE_DTYPE = np.dtype(
+    [
+        ("frame", np.int64),
+        ("duration", np.int64),
+        ("value", np.float64),
+        ("level", np.float64),
+    ]
+)
+
+
+@functools.lru_cache(maxsize=1)
+def get_code_version() -> str:
+    """Return hash of the code and the scale files that influence transcriptions."""
+    return caching.hash_data(
+        caching.hash_files(
+            __file__,
+            audio.__file__,
+            complex_meters.__file__,
+            globals_.__file__,
+            ticks.__file__,
+        ),
+        # the intonations are read from the scale files
+        globals_.PITCH_TABLES_KEY,
+    )
 
 
 class MeterTranscriber(object):
+    # all onsets are compared on a grid of eighth notes
+    _grid_size = fractions.Fraction(1, 8)
+
     def __init__(self):
         self.potential_meters = self._generate_potential_meters()
+        self._fitness_per_meter = tuple(
+            np.array(meter[1], dtype=float) for meter in self.potential_meters
+        )
 
-    def __call__(self, melody: old.Melody) -> tuple:
+    def __call__(self, melody: old.Melody, jobs: int = None) -> tuple:
+        # 'jobs' only exists for having the same interface as ComplexMeterTranscriber,
+        # the search is fast enough to be done in one process
         return self.estimate_best_meter(melody)
 
     def estimate_best_meter(self, melody: old.Melody) -> tuple:
         """Return (Melody, TimeSignature) - pair."""
-        meter_fitness_pairs = []
-        for meter in self.potential_meters:
-            n_potential_upbeats = int(
-                fractions.Fraction(meter[0].numerator, meter[0].denominator)
-                / fractions.Fraction(1, 8)
-            )
-            for n_upbeats in range(n_potential_upbeats):
-                adadpted_melody = melody.copy()
-                if n_upbeats:
-                    adadpted_melody.insert(
-                        0, old.Rest(n_upbeats * fractions.Fraction(1, 8))
-                    )
-                metricity = self._calculate_metricity_of_melody(meter, adadpted_melody)
-                meter_fitness_pairs.append((adadpted_melody, meter[0], metricity))
+        ticks, is_on_grid = self._convert_onsets2ticks(melody)
+        duration = melody.duration
 
-        return max(meter_fitness_pairs, key=operator.itemgetter(2))[:2]
+        best_meter, best_n_upbeats, best_metricity = None, None, None
+        for meter, fitness_per_beat in zip(
+            self.potential_meters, self._fitness_per_meter
+        ):
+            metricity_per_upbeat = self._calculate_metricity_per_upbeat(
+                meter[0], fitness_per_beat, ticks, is_on_grid, duration
+            )
+            # argmax returns the first maximum, like the builtin max function
+            n_upbeats = int(np.argmax(metricity_per_upbeat))
+            if best_metricity is None or metricity_per_upbeat[n_upbeats] > (
+                best_metricity
+            ):
+                best_meter = meter
+                best_n_upbeats = n_upbeats
+                best_metricity = metricity_per_upbeat[n_upbeats]
+
+        # the adapted melody is only built for the best meter
+        adapted_melody = melody.copy()
+        if best_n_upbeats:
+            adapted_melody.insert(0, old.Rest(best_n_upbeats * self._grid_size))
+
+        return adapted_melody, best_meter[0]
 
     @staticmethod
     def _generate_potential_meters() -> tuple:
@@ -65,36 +113,66 @@ class MeterTranscriber(object):
             for ts, primes in globals_.AVAILABLE_TIME_SIGNATURES
         )
 
-    @staticmethod
-    def _calculate_metricity_of_melody(
-        time_signature: tuple, melody: old.Melody
-    ) -> float:
-        duration = melody.duration
+    @classmethod
+    def _convert_onsets2ticks(cls, melody: old.Melody) -> tuple:
+        """Return (ticks, is_on_grid) - pair of arrays for all onsets of pitched tones.
 
-        fitness_per_beat = {}
-        rising = fractions.Fraction(1, 8)
-        position = 0
-        for _ in range(
-            int(
-                math.ceil(
-                    duration
-                    / (time_signature[0].numerator / time_signature[0].denominator)
-                )
-            )
-        ):
-            for fitness in time_signature[1]:
-                fitness_per_beat.update({position: fitness})
-                position += rising
+        Ticks are the onsets measured in grid units. Onsets between two grid points
+        can never reach a beat, no matter how many upbeats get added.
+        """
+        onsets = tuple(
+            fractions.Fraction(tone.delay) / cls._grid_size
+            for tone in melody.convert2absolute()
+            if tone.pitch
+        )
+        ticks = np.array(tuple(int(onset) for onset in onsets), dtype=np.int64)
+        is_on_grid = np.array(
+            tuple(onset.denominator == 1 for onset in onsets), dtype=bool
+        )
+        return ticks, is_on_grid
+
+    @classmethod
+    def _calculate_metricity_per_upbeat(
+        cls,
+        time_signature: abjad.TimeSignature,
+        fitness_per_beat: np.ndarray,
+        ticks: np.ndarray,
+        is_on_grid: np.ndarray,
+        duration: fractions.Fraction,
+    ) -> np.ndarray:
+        """Return metricity of the melody for each possible number of upbeats.
+
+        Each upbeat delays the melody by one grid unit. Tones that are on a beat add
+        the fitness of the beat, all other tones decrease the metricity by 0.01.
+        """
+        n_potential_upbeats = int(
+            fractions.Fraction(time_signature.numerator, time_signature.denominator)
+            / cls._grid_size
+        )
+        bar_duration = time_signature.numerator / time_signature.denominator
+        n_beats_per_upbeat = np.array(
+            tuple(
+                int(math.ceil((duration + (n_upbeats * cls._grid_size)) / bar_duration))
+                * len(fitness_per_beat)
+                for n_upbeats in range(n_potential_upbeats)
+            ),
+            dtype=np.int64,
+        )
 
-        metricity = 0
-        for tone in melody.convert2absolute():
-            if tone.pitch:
-                try:
-                    metricity += fitness_per_beat[tone.delay]
-                except KeyError:
-                    metricity -= 0.01
+        if len(ticks) == 0:
+            return np.zeros(n_potential_upbeats)
 
-        return metricity
+        shifted_ticks = (
+            ticks[np.newaxis, :] + np.arange(n_potential_upbeats)[:, np.newaxis]
+        )
+        is_on_beat = is_on_grid[np.newaxis, :] & (
+            shifted_ticks < n_beats_per_upbeat[:, np.newaxis]
+        )
+        metricity_per_tone = np.where(
+            is_on_beat, fitness_per_beat[shifted_ticks % len(fitness_per_beat)], -0.01
+        )
+        # cumsum adds the values in the same order as a python loop would do
+        return np.cumsum(metricity_per_tone, axis=1)[:, -1]
 
 
 class TimeTranscriber(object):
@@ -110,8 +188,18 @@ class TimeTranscriber(object):
         post_stretch_factor: fractions.Fraction = fractions.Fraction(2, 1),
         remove_repeating_pitches: bool = False,
         meter_transcriber: MeterTranscriber = complex_meters.ComplexMeterTranscriber(),
+        jobs: int = None,
+        tempo_estimation_decimation: int = None,
     ):
+        if tempo_estimation_decimation is not None and (
+            tempo_estimation_method != "librosa"
+        ):
+            raise ValueError(
+                "Decimated tempo estimation is only supported for method 'librosa'."
+            )
+
         self.tempo_estimation_method = tempo_estimation_method
+        self.tempo_estimation_decimation = tempo_estimation_decimation
         self.n_divisions = n_divisions
         self.min_tone_size = min_tone_size
         self.min_rest_size = min_rest_size
@@ -119,6 +207,9 @@ class TimeTranscriber(object):
         self.post_stretch_factor = post_stretch_factor
         self.remove_repeating_pitches = remove_repeating_pitches
         self.meter_transcriber = meter_transcriber
+        # number of processes for the meter estimation (None: setting of the
+        # meter transcriber)
+        self.jobs = jobs
 
     @staticmethod
     def _filter_raw_data_and_convert2melody(raw_data: tuple) -> old.Melody:
@@ -160,6 +251,7 @@ class TimeTranscriber(object):
                 "stretch_factor",
                 "post_stretch_factor",
                 "remove_repeating_pitches",
+                "tempo_estimation_decimation",
             )
             return all(
                 tuple(
@@ -171,7 +263,7 @@ class TimeTranscriber(object):
 
     @property
     def json_key(self) -> tuple:
-        return tuple(
+        key = tuple(
             getattr(self, attr)
             for attr in (
                 "tempo_estimation_method",
@@ -184,6 +276,12 @@ class TimeTranscriber(object):
             )
         )
 
+        # only added if set, so that keys of already cached transcriptions stay valid
+        if self.tempo_estimation_decimation is not None:
+            key += (self.tempo_estimation_decimation,)
+
+        return key
+
     def __call__(self, sf_path: str, raw_data: tuple) -> tuple:
         """Return (old.Melody, bars)."""
 
@@ -211,10 +309,44 @@ class TimeTranscriber(object):
         return melody, metre, spread_metrical_loop, tempo
 
     def estimate_tempo(self, sf_path: str, params: dict = None) -> float:
-        return bpm_extract.BPM(
-            sf_path, method=self.tempo_estimation_method, params=params
+        """Return tempo of a soundfile.
+
+        Results are cached on disk, keyed by the content of the soundfile and all
+        parameters of the estimation. Changing other parameters of the TimeTranscriber
+        therefore doesn't lead to a new (slow) analysis of the soundfile.
+        """
+        key = caching.hash_data(
+            caching.hash_file_content(sf_path),
+            self.tempo_estimation_method,
+            sorted(params.items()) if params else None,
+            self.tempo_estimation_decimation,
+        )
+        return caching.load_or_build(
+            "{}/tempo/{}.pickle".format(globals_.CACHE_PATH, key),
+            key,
+            lambda: self._estimate_tempo(sf_path, params),
         )
 
+    def _estimate_tempo(self, sf_path: str, params: dict = None) -> float:
+        if self.tempo_estimation_decimation is None:
+            return bpm_extract.BPM(
+                sf_path, method=self.tempo_estimation_method, params=params
+            )
+
+        import librosa
+
+        signal, sample_rate = audio.load_wav(sf_path, self.tempo_estimation_decimation)
+        if params is None:
+            params = {}
+
+        try:
+            tempo = librosa.feature.rhythm.tempo
+        # librosa < 0.10 only has the (now deprecated) beat.tempo function
+        except AttributeError:
+            tempo = librosa.beat.tempo
+
+        return float(tempo(y=signal, sr=sample_rate, **params)[0])
+
     def estimate_rhythm(self, melody: old.Melody) -> tuple:
         melody.dur = rhy.Compound(melody.dur).stretch(self.stretch_factor)
         melody.delay = rhy.Compound(melody.delay).stretch(self.stretch_factor)
@@ -226,7 +358,10 @@ class TimeTranscriber(object):
         return melody
 
     def estimate_metre(self, melody: old.Melody) -> tuple:
-        return self.meter_transcriber(melody)
+        # without explicitly set jobs the meter transcriber uses its own setting
+        if self.jobs is None:
+            return self.meter_transcriber(melody)
+        return self.meter_transcriber(melody, jobs=self.jobs)
 
 
 class ComplexScaleTranscriber(object):
@@ -234,9 +369,39 @@ class ComplexScaleTranscriber(object):
 
     A complex scale is defined as a scale that has multiple options or intonations for the
     same scale degree.
+
+    By default the transcription is found note by note: for each interval the closest
+    scale degree (according to the original scale) and then the closest intonation are
+    chosen, and of the transcriptions for all intonations of the starting scale degree
+    the one with the best fitness is returned.
+
+    If 'use_dynamic_programming' is True, a dynamic programming search over all
+    (scale degree, intonation, octave) states is used instead. It returns the pitch
+    sequence whose intervals have the smallest summed absolute deviation from the
+    measured intervals. This is a different objective than the fitness of the default
+    search (which also depends on the original scale), so both searches can return
+    different transcriptions.
     """
 
-    def __init__(self, original_scale: tuple, intonations_per_scale_degree: tuple):
+    def __init__(
+        self,
+        original_scale: tuple,
+        intonations_per_scale_degree: tuple,
+        use_dynamic_programming: bool = False,
+    ):
+        self._use_dynamic_programming = use_dynamic_programming
+        self._intonation_states = tuple(
+            (scale_degree, nth_intonation)
+            for scale_degree, intonations in enumerate(intonations_per_scale_degree)
+            for nth_intonation in range(len(intonations))
+        )
+        self._cents_per_intonation_state = np.array(
+            tuple(
+                intonations_per_scale_degree[scale_degree][nth_intonation].cents
+                for scale_degree, nth_intonation in self._intonation_states
+            ),
+            dtype=float,
+        )
         self._scale_size = len(original_scale)
         self._original_scale = original_scale
         self._intonations_per_scale_degree = intonations_per_scale_degree
@@ -345,11 +510,59 @@ class ComplexScaleTranscriber(object):
 
         return tuple(pitches), fitness
 
-    def __call__(self, frequencies: tuple) -> tuple:
-        cent_distances = tuple(
-            mel.SimplePitch.hz2ct(f0, f1)
-            for f0, f1 in zip(frequencies, frequencies[1:])
+    def _make_states(self, cent_distances: np.ndarray) -> tuple:
+        """Return (states, cents_per_state, octave_per_state).
+
+        States are (scale_degree, intonation, octave) - triples for all octaves that
+        the melody could reach.
+        """
+        accumulated_cents = np.concatenate(((0,), np.cumsum(cent_distances)))
+        octaves = np.arange(
+            int(np.floor(accumulated_cents.min() / 1200)) - 1,
+            int(np.ceil(accumulated_cents.max() / 1200)) + 2,
         )
+        states = tuple(
+            (scale_degree, nth_intonation, int(octave))
+            for octave in octaves
+            for scale_degree, nth_intonation in self._intonation_states
+        )
+        cents_per_state = (
+            self._cents_per_intonation_state[np.newaxis, :]
+            + (1200 * octaves[:, np.newaxis])
+        ).ravel()
+        octave_per_state = np.repeat(octaves, len(self._intonation_states))
+        return states, cents_per_state, octave_per_state
+
+    def _find_optimal_transcription(self, cent_distances: np.ndarray) -> tuple:
+        states, cents_per_state, octave_per_state = self._make_states(cent_distances)
+        n_states = len(states)
+        state_indices = np.arange(n_states)
+
+        # interval_matrix[x, y] is the interval in cents from state x to state y
+        interval_matrix = (
+            cents_per_state[np.newaxis, :] - cents_per_state[:, np.newaxis]
+        )
+
+        # the first pitch always has to be in octave 0
+        costs = np.where(octave_per_state == 0, 0, np.inf)
+        best_previous_state_per_step = np.empty(
+            (len(cent_distances), n_states), dtype=np.intp
+        )
+        for step, distance in enumerate(cent_distances):
+            costs_per_transition = costs[:, np.newaxis] + np.abs(
+                interval_matrix - distance
+            )
+            best_previous_state = np.argmin(costs_per_transition, axis=0)
+            best_previous_state_per_step[step] = best_previous_state
+            costs = costs_per_transition[best_previous_state, state_indices]
+
+        path = [int(np.argmin(costs))]
+        for best_previous_state in best_previous_state_per_step[::-1]:
+            path.append(int(best_previous_state[path[-1]]))
+
+        return tuple(states[state_idx] for state_idx in reversed(path))
+
+    def _find_greedy_transcription(self, cent_distances: tuple) -> tuple:
         starting_scale_degree = self._detect_starting_scale_degree(cent_distances)
 
         transcription_and_fitness_pairs = []
@@ -360,7 +573,15 @@ class ComplexScaleTranscriber(object):
                 self._make_transcription(starting_scale_degree, n, cent_distances)
             )
 
-        best = min(transcription_and_fitness_pairs, key=operator.itemgetter(1))[0]
+        return min(transcription_and_fitness_pairs, key=operator.itemgetter(1))[0]
+
+    def __call__(self, frequencies: np.ndarray) -> tuple:
+        cent_distances = np.diff(1200 * np.log2(np.asarray(frequencies, dtype=float)))
+
+        if self._use_dynamic_programming:
+            best = self._find_optimal_transcription(cent_distances)
+        else:
+            best = self._find_greedy_transcription(tuple(cent_distances.tolist()))
 
         # convert abstract data to actual pitch objects
         return tuple(
@@ -440,24 +661,43 @@ class Transcription(old.Melody):
         return self.__frequency_range
 
     @staticmethod
-    def _get_root(path: str):
-        tree = ET.parse(path)
-        return tree.getroot()
+    def _read_svl(path: str) -> tuple:
+        """Return (model_attributes, notes) - pair of a SVL file.
 
-    @staticmethod
-    def _filter_data_from_root(root) -> tuple:
-        data = []
-        sr = int(root[0][0].attrib["sampleRate"])
-        for child in root[0][1]:
-            start = int(child.attrib["frame"]) / sr
-            duration = int(child.attrib["duration"]) / sr
-            freq = float(child.attrib["value"])
-            volume = float(child.attrib["level"])
-            stop_time = start + duration
+        Notes are returned as a structured array with the fields 'frame',
+        'duration', 'value' (frequency) and 'level' (volume). The file is parsed
+        incrementally and already processed elements are freed immediately.
+        """
+        model_attributes = None
+        dataset = None
+        notes = np.empty(256, dtype=SVL_NOTE_DTYPE)
+        n_notes = 0
+        for event, element in ET.iterparse(path, events=("start", "end")):
+            if event == "start":
+                if element.tag == "model" and model_attributes is None:
+                    model_attributes = dict(element.attrib)
+                elif element.tag == "dataset":
+                    dataset = element
+
+            elif element.tag == "point":
+                if n_notes == len(notes):
+                    notes = np.concatenate(
+                        (notes, np.empty(len(notes), dtype=SVL_NOTE_DTYPE))
+                    )
+                attrib = element.attrib
+                notes[n_notes] = (
+                    int(attrib["frame"]),
+                    int(attrib["duration"]),
+                    float(attrib["value"]),
+                    float(attrib["level"]),
+                )
+                n_notes += 1
+                dataset.clear()
 
-            data.append([freq, start, stop_time, volume])
+            elif element.tag == "dataset":
+                break
 
-        return tuple(map(tuple, data))
+        return model_attributes, notes[:n_notes].copy()
 
     @classmethod
     def from_complex_scale(
@@ -469,16 +709,19 @@ class Transcription(old.Melody):
         octave_of_first_pitch: int = 0,
         ratio2pitchclass_dict: dict = None,
     ) -> "Transcription":
-        root = cls._get_root(svl_path)
-        frequency_range = root[0][0].attrib["minimum"], root[0][0].attrib["maximum"]
-        data = cls._filter_data_from_root(root)
+        model_attributes, notes = cls._read_svl(svl_path)
+        frequency_range = model_attributes["minimum"], model_attributes["maximum"]
+        sr = int(model_attributes["sampleRate"])
+        starts = notes["frame"] / sr
+        stop_times = starts + (notes["duration"] / sr)
 
-        frequencies = tuple(map(operator.itemgetter(0), data))
         octavater = ji.r(1, 1).register(octave_of_first_pitch)
         pitches = tuple(
-            octavater + pitch for pitch in complex_scale_transcriber(frequencies)
+            octavater + pitch for pitch in complex_scale_transcriber(notes["value"])
+        )
+        new_data = tuple(
+            zip(pitches, starts.tolist(), stop_times.tolist(), notes["level"].tolist())
         )
-        new_data = tuple((pitch,) + tone[1:] for pitch, tone in zip(pitches, data))
 
         melody, metre, spread_metrical_loop, tempo = time_transcriber(sf_path, new_data)
         if isinstance(metre, abjad.TimeSignature):
@@ -611,20 +854,22 @@ class QiroahTranscription(Transcription):
         time_transcriber=TimeTranscriber(),
         octave_of_first_pitch: int = 0,
         use_full_scale: bool = False,
+        use_dynamic_programming: bool = False,
     ) -> "QiroahTranscription":
-        svl_path = "aml/transcriptions/qiroah_{}_{}.svl".format(chapter, verse)
-        sf_path = "aml/samples/qiroah/without_reverb/qiroah_{}_{}.wav".format(
-            chapter, verse
-        )
+        svl_path = globals_.TRANSCRIPTION_PATH.format(chapter, verse)
+        sf_path = globals_.QIROAH_SAMPLE_PATH.format(chapter, verse)
 
         if use_full_scale:
             complex_scale_transcriber = ComplexScaleTranscriber(
-                globals_.ORIGINAL_SCALE, globals_.INTONATIONS_PER_SCALE_DEGREE
+                globals_.ORIGINAL_SCALE,
+                globals_.INTONATIONS_PER_SCALE_DEGREE,
+                use_dynamic_programming,
             )
         else:
             complex_scale_transcriber = ComplexScaleTranscriber(
                 globals_.FILTERED_ORIGINAL_SCALE,
                 globals_.FILTERED_INTONATIONS_PER_SCALE_DEGREE,
+                use_dynamic_programming,
             )
 
         return super(QiroahTranscription, cls).from_complex_scale(
@@ -635,3 +880,157 @@ class QiroahTranscription(Transcription):
             octave_of_first_pitch=octave_of_first_pitch,
             ratio2pitchclass_dict=globals_.RATIO2PITCHCLASS,
         )
+
+
+class ColumnarTranscription(object):
+    """Compact representation of a Transcription for saving it on disk.
+
+    Instead of pickling every Tone with its JIPitch and Fraction objects, the melody
+    is saved as a few arrays: pitches as numerator / denominator pairs (a denominator
+    of 0 marks an empty pitch), rhythms as integer ticks and volumes as floats (NaN
+    for missing volumes). The SpreadMetricalLoop is pickled by its defining bars and
+    its number of repetitions. The Transcription is only rebuilt when
+    'to_transcription' gets called for the first time.
+    """
+
+    def __init__(
+        self,
+        transcription_class: type,
+        resolution: int,
+        columns: dict,
+        bars: np.ndarray,
+        attributes: dict,
+    ):
+        self._transcription_class = transcription_class
+        self._resolution = resolution
+        self._columns = columns
+        self._bars = bars
+        self._attributes = attributes
+        self._transcription = None
+
+    def __repr__(self) -> str:
+        return "ColumnarTranscription({} tones)".format(len(self))
+
+    def __len__(self) -> int:
+        return len(self._columns["delay"])
+
+    def __getstate__(self) -> dict:
+        state = dict(self.__dict__)
+        state["_transcription"] = None
+        return state
+
+    @classmethod
+    def from_transcription(
+        cls, transcription: Transcription
+    ) -> "ColumnarTranscription":
+        is_empty = tuple(tone.pitch.is_empty for tone in transcription)
+        rhythms = tuple(tone.delay for tone in transcription) + tuple(
+            tone.duration for tone in transcription
+        )
+        tick_grid = ticks.TickGrid.from_values(rhythms)
+        columns = {
+            "numerator": np.array(
+                tuple(
+                    0 if empty else tone.pitch.numerator
+                    for empty, tone in zip(is_empty, transcription)
+                ),
+                dtype=np.int64,
+            ),
+            "denominator": np.array(
+                tuple(
+                    0 if empty else tone.pitch.denominator
+                    for empty, tone in zip(is_empty, transcription)
+                ),
+                dtype=np.int64,
+            ),
+            "multiply": np.array(
+                tuple(
+                    1 if empty else tone.pitch.multiply
+                    for empty, tone in zip(is_empty, transcription)
+                ),
+                dtype=np.float64,
+            ),
+            "is_rest": np.array(
+                tuple(isinstance(tone, old.Rest) for tone in transcription), dtype=bool
+            ),
+            "delay": np.array(
+                tick_grid.to_ticks_tuple(rhythms[: len(transcription)]), dtype=np.int64
+            ),
+            "duration": np.array(
+                tick_grid.to_ticks_tuple(rhythms[len(transcription) :]), dtype=np.int64
+            ),
+            "volume": np.array(
+                tuple(
+                    np.nan if tone.volume is None else tone.volume
+                    for tone in transcription
+                ),
+                dtype=np.float64,
+            ),
+        }
+        bars = np.array(
+            tuple((bar.numerator, bar.denominator) for bar in transcription.bars),
+            dtype=np.int64,
+        )
+        attributes = {
+            "frequency_range": transcription.frequency_range,
+            "ratio2pitchclass_dict": transcription.ratio2pitchclass_dict,
+            "tempo": transcription.tempo,
+            "spread_metrical_loop": transcription.spread_metrical_loop,
+            # the concert pitch property returns a default value if it hasn't been set
+            "concert_pitch": transcription._Transcription__concert_pitch,
+        }
+        return cls(type(transcription), tick_grid.resolution, columns, bars, attributes)
+
+    def _make_melody(self) -> tuple:
+        tick_grid = ticks.TickGrid(self._resolution)
+        melody = []
+        for numerator, denominator, multiply, is_rest, delay, duration, volume in zip(
+            *(
+                self._columns[column].tolist()
+                for column in (
+                    "numerator",
+                    "denominator",
+                    "multiply",
+                    "is_rest",
+                    "delay",
+                    "duration",
+                    "volume",
+                )
+            )
+        ):
+            delay = tick_grid.to_fraction(delay)
+            duration = tick_grid.to_fraction(duration)
+            if is_rest:
+                melody.append(old.Rest(delay, duration))
+                continue
+
+            if denominator:
+                pitch = ji.r(numerator, denominator)
+                pitch.multiply = multiply
+            else:
+                pitch = mel.TheEmptyPitch
+
+            melody.append(
+                old.Tone(
+                    pitch,
+                    delay,
+                    duration,
+                    volume=None if math.isnan(volume) else volume,
+                )
+            )
+
+        return tuple(melody)
+
+    def to_transcription(self) -> Transcription:
+        if self._transcription is None:
+            self._transcription = self._transcription_class(
+                self._make_melody(),
+                tuple(abjad.TimeSignature(tuple(bar)) for bar in self._bars.tolist()),
+                self._attributes["frequency_range"],
+                self._attributes["ratio2pitchclass_dict"],
+                self._attributes["tempo"],
+                self._attributes["spread_metrical_loop"],
+                self._attributes["concert_pitch"],
+            )
+
+        return self._transcription
@@ -22,6 +22,7 @@ from mutools import lily
 from mutools import mus
 
 from aml import globals_
+from aml import pitch_registry
 
 from aml.trackmaker import keyboard
 
@@ -318,7 +319,7 @@ def split_by_structure(
 
         sml = verse_maker.transcription.spread_metrical_loop
         instruments = tuple(
-            globals_.PITCH2INSTRUMENT[pitch.normalize()]
+            pitch_registry.REGISTRY.get_instrument(pitch)
             for pitch in novent_line[nth_event].pitch
         )
 
@@ -414,10 +415,8 @@ def add_glissando(
     assert len(durations) == len(scale_degrees) - 1
 
     novent = novent_line[nth_event].copy()
-    normalized_pitch = novent.pitch[0].normalize()
-
-    instrument = globals_.PITCH2INSTRUMENT[normalized_pitch]
-    octave = novent.pitch[0].octave
+    instrument = pitch_registry.REGISTRY.get_instrument(novent.pitch[0])
+    octave = pitch_registry.REGISTRY.get_octave(novent.pitch[0])
     pitch_zone = tuple(
         p.register(octave)
         for p in sorted(
@@ -487,9 +486,7 @@ def _get_artifical_harmonic_pitches(pitch: ji.JIPitch) -> tuple:
     (
         harmonic_pitch_class,
         harmonic_octave_difference,
-    ) = globals_.RATIO2ARTIFICAL_HARMONIC_PITCHCLASS_AND_ARTIFICIAL_HARMONIC_OCTAVE[
-        pitch.register(0)
-    ]
+    ) = pitch_registry.REGISTRY.get_artifical_harmonic(pitch)
     harmonic_pitch_octave = ground_pitch.octave.number + harmonic_octave_difference
     harmonic_pitch = abjad.NamedPitch(
         name=harmonic_pitch_class, octave=harmonic_pitch_octave
@@ -2,10 +2,10 @@ import copy
 import functools
 import itertools
 import json
+import numpy as np
 import operator
 import os
 import pickle
-import uuid
 
 import abjad
 import quicktions as fractions
@@ -24,7 +24,10 @@ from mutools import synthesis
 
 from aml import areas
 from aml import breads
+from aml import caching
 from aml import globals_
+from aml import manifest
+from aml import pitch_registry
 from aml import transcriptions
 
 from aml.trackmaker import keyboard
@@ -185,6 +188,19 @@ class Verse(mus.Segment):
         return sco
 
 
+@functools.lru_cache(maxsize=1)
+def get_code_version() -> str:
+    """Return hash of the code and the scale files that influence verse analyses."""
+    return caching.hash_data(
+        transcriptions.get_code_version(),
+        caching.hash_files(
+            __file__, areas.__file__, breads.__file__, pitch_registry.__file__
+        ),
+        # harmonicities and instruments are derived from the scale files
+        globals_.PITCH_TABLES_KEY,
+    )
+
+
 class VerseMaker(mus.SegmentMaker):
     """Class for the generation of musical segments based on the qiroah transcription.
 
@@ -215,9 +231,50 @@ class VerseMaker(mus.SegmentMaker):
     ratio2pitchclass_dict = globals_.RATIO2PITCHCLASS
     orchestration = globals_.ORCHESTRATION
     _segment_class = Verse
-    _pickled_objects_path = "aml/transobjects"
-    tools.igmkdir(_pickled_objects_path)
-    _json_path = "{}/transobjects.json".format(_pickled_objects_path)
+    transcription_cache = caching.DirectoryCache(
+        globals_.TRANSCRIPTION_CACHE_PATH, globals_.TRANSCRIPTION_CACHE_MAX_SIZE
+    )
+    # the analysis pipeline of a VerseMaker; results of all stages except of the tracks
+    # are shared between copies of the same maker
+    stages = (
+        "transcription",
+        "areas",
+        "bread",
+        "harmonic_pitches",
+        "harmonic_fields",
+        "rhythmic_orientation",
+        "tracks",
+    )
+    # the tracks contain trackmakers and sound engines that can't be pickled reliably,
+    # so they aren't part of checkpoints and have to be attached again after loading
+    checkpoint_stages = stages[:-1]
+    # harmonic pitches and fields are attached to the slices of the bread (so changing
+    # them means changing the bread), the tracks are all attributes that don't belong
+    # to any other stage
+    _stage2attributes = {
+        "transcription": ("transcription", "_transcription_melody"),
+        "areas": ("areas",),
+        "bread": ("bread",),
+        "harmonic_pitches": ("bread",),
+        "harmonic_fields": ("bread",),
+        "rhythmic_orientation": (
+            "rhythmic_orientation_indices",
+            "melodic_orientation",
+            "rhythmic_orientation",
+        ),
+    }
+    # (attribute, default_value) - pairs of the slice attributes that are the output of
+    # the stages that work on the bread; checkpoints only contain these values
+    _stage2slice_attributes = {
+        "harmonic_pitches": (("harmonic_pitch", None), ("has_tonality_flux", False)),
+        "harmonic_fields": (("harmonic_field", None),),
+    }
+
+    # deterministic analysis results are cached, so that changing post-processing
+    # tweaks of a verse doesn't repeat the harmonic search
+    analysis_cache = caching.DirectoryCache(
+        globals_.VERSE_ANALYSIS_CACHE_PATH, globals_.VERSE_ANALYSIS_CACHE_MAX_SIZE
+    )
 
     def __init__(
         self,
@@ -254,48 +311,57 @@ class VerseMaker(mus.SegmentMaker):
         area_density_reference_size: fractions.Fraction = fractions.Fraction(1, 2),
         area_min_split_size: fractions.Fraction = fractions.Fraction(1, 4),
     ) -> None:
-        if area_density_maker is None:
-            area_density_maker = infit.Gaussian(0.25, 0.075)
-
-        self.transcription = self._get_transcription(
+        transcription_parameters = dict(
             chapter=chapter,
             verse=verse,
             time_transcriber=time_transcriber,
             octave_of_first_pitch=octave_of_first_pitch,
             use_full_scale=use_full_scale,
         )
+        self.transcription = self._get_transcription(**transcription_parameters)
+        transcription_key = self._make_transcription_key(**transcription_parameters)
+
         self._transcription_melody = old.Melody(tuple(self.transcription[:]))
-        self.areas = areas.Areas.from_melody(
-            self._transcription_melody,
-            self.transcription.spread_metrical_loop,
-            area_density_maker,
-            area_density_reference_size,
-            area_min_split_size,
-        )
         self.chapter = chapter
         self.verse = verse
         self.tempo_factor = tempo_factor
-        self.bread = breads.Bread.from_melody(
-            old.Melody(self.transcription).copy(),
-            self.bars,
-            max_rest_size_to_ignore,
-            maximum_deviation_from_center,
+
+        area_parameters = (
+            area_density_reference_size,
+            area_min_split_size,
         )
+        if area_density_maker is None:
+            self.areas = self.analysis_cache.load_or_build(
+                caching.hash_data(
+                    "areas", transcription_key, area_parameters, get_code_version()
+                ),
+                lambda: self._make_areas(infit.Gaussian(0.25, 0.075), *area_parameters),
+            )
 
-        self.assign_harmonic_pitches_to_slices(
+        # custom density makers can't be part of a key
+        else:
+            self.areas = self._make_areas(area_density_maker, *area_parameters)
+
+        analysis_parameters = (
+            max_rest_size_to_ignore,
+            maximum_deviation_from_center,
             harmonic_tolerance,
             harmonic_pitches_add_artifical_harmonics,
             harmonic_pitches_add_normal_pitches,
             harmonic_pitches_tonality_flux_maximum_octave_difference_from_melody_pitch,
             harmonic_pitches_complex_interval_helper_maximum_octave_difference_from_melody_pitch,
+            harmonic_field_max_n_pitches,
+            harmonic_field_minimal_harmonicity,
+            ro_temperature,
+            ro_density,
         )
-        self.assign_harmonic_fields_to_slices(
-            harmonic_field_max_n_pitches, harmonic_field_minimal_harmonicity
-        )
-
-        self.rhythmic_orientation_indices = self._detect_rhythmic_orientation(
-            temperature=ro_temperature, density=ro_density
+        analysis = self.analysis_cache.load_or_build(
+            caching.hash_data(
+                "analysis", transcription_key, analysis_parameters, get_code_version()
+            ),
+            lambda: self._analyse(*analysis_parameters),
         )
+        self.bread, self.rhythmic_orientation_indices = analysis
 
         self.melodic_orientation = self._make_melodic_orientation_system()
         self.rhythmic_orientation = self._make_rhythmic_orientation_system()
@@ -309,57 +375,106 @@ class VerseMaker(mus.SegmentMaker):
             keyboard=keyboard.SilentKeyboardMaker(),
         )
 
-    @classmethod
-    def _get_transcription(cls, **kwargs) -> transcriptions.Transcription:
-        key = sorted(
-            (
-                (kw, kwargs[kw].json_key)
-                if kw == "time_transcriber"
-                else (kw, kwargs[kw])
-                for kw in kwargs
-            ),
-            key=operator.itemgetter(0),
-        )
-        key = str(tuple(map(operator.itemgetter(1), key)))
-
-        with open(cls._json_path, "r") as f:
-            transobjects = json.loads(f.read())
-
-        try:
-            path = transobjects[key]
-
-        except KeyError:
-            transcription = transcriptions.QiroahTranscription.from_complex_scale(
-                **kwargs
+    @staticmethod
+    def _make_transcription_key(**kwargs) -> str:
+        """Return hash of all inputs of a transcription.
+
+        Besides the parameters the key contains the content of the SVL file, the
+        content of the recording and the source code of the transcription modules.
+        """
+        parameters = tuple(
+            sorted(
+                (
+                    (kw, kwargs[kw].json_key)
+                    if kw == "time_transcriber"
+                    else (kw, kwargs[kw])
+                    for kw in kwargs
+                ),
+                key=operator.itemgetter(0),
             )
+        )
+        entry = manifest.find_entry(kwargs["chapter"], kwargs["verse"])
+        return caching.hash_data(
+            parameters,
+            entry["svl_hash"],
+            entry["sf_hash"],
+            transcriptions.get_code_version(),
+        )
 
-            path = "{}/trans_{}_{}_{}".format(
-                cls._pickled_objects_path,
-                kwargs["chapter"],
-                kwargs["verse"],
-                uuid.uuid4().hex,
-            )
+    @classmethod
+    def has_cached_transcription(cls, **kwargs) -> bool:
+        return cls._make_transcription_key(**kwargs) in cls.transcription_cache
 
-            while path in os.listdir(cls._pickled_objects_path):
-                path = "{}/trans_{}_{}_{}".format(
-                    cls._pickled_objects_path,
-                    kwargs["chapter"],
-                    kwargs["verse"],
-                    uuid.uuid4().hex,
-                )
+    @classmethod
+    def _store_transcription(
+        cls, transcription: transcriptions.Transcription, **kwargs
+    ) -> None:
+        cls.transcription_cache.put(
+            cls._make_transcription_key(**kwargs),
+            transcriptions.ColumnarTranscription.from_transcription(transcription),
+        )
 
-            transobjects.update({key: path})
+    @classmethod
+    def _get_transcription(cls, **kwargs) -> transcriptions.Transcription:
+        # transcriptions are saved in a columnar format that is much faster to load
+        return cls.transcription_cache.load_or_build(
+            cls._make_transcription_key(**kwargs),
+            lambda: transcriptions.ColumnarTranscription.from_transcription(
+                transcriptions.QiroahTranscription.from_complex_scale(**kwargs)
+            ),
+        ).to_transcription()
 
-            with open(path, "wb") as f:
-                pickle.dump(transcription, f)
+    def _make_areas(
+        self,
+        area_density_maker: infit.InfIt,
+        area_density_reference_size: fractions.Fraction,
+        area_min_split_size: fractions.Fraction,
+    ) -> areas.Areas:
+        return areas.Areas.from_melody(
+            self._transcription_melody,
+            self.transcription.spread_metrical_loop,
+            area_density_maker,
+            area_density_reference_size,
+            area_min_split_size,
+        )
 
-            with open(cls._json_path, "w") as f:
-                f.write(json.dumps(transobjects))
+    def _analyse(
+        self,
+        max_rest_size_to_ignore: fractions.Fraction,
+        maximum_deviation_from_center: float,
+        harmonic_tolerance: float,
+        harmonic_pitches_add_artifical_harmonics: bool,
+        harmonic_pitches_add_normal_pitches: bool,
+        harmonic_pitches_tonality_flux_maximum_octave_difference_from_melody_pitch: tuple,
+        harmonic_pitches_complex_interval_helper_maximum_octave_difference_from_melody_pitch: tuple,
+        harmonic_field_max_n_pitches: int,
+        harmonic_field_minimal_harmonicity: float,
+        ro_temperature: float,
+        ro_density: float,
+    ) -> tuple:
+        """Return (bread, rhythmic_orientation_indices) - pair."""
+        self.bread = breads.Bread.from_melody(
+            old.Melody(self.transcription).copy(),
+            self.bars,
+            max_rest_size_to_ignore,
+            maximum_deviation_from_center,
+        )
 
-        with open(path, "rb") as f:
-            transcription = pickle.load(f)
+        self.assign_harmonic_pitches_to_slices(
+            harmonic_tolerance,
+            harmonic_pitches_add_artifical_harmonics,
+            harmonic_pitches_add_normal_pitches,
+            harmonic_pitches_tonality_flux_maximum_octave_difference_from_melody_pitch,
+            harmonic_pitches_complex_interval_helper_maximum_octave_difference_from_melody_pitch,
+        )
+        self.assign_harmonic_fields_to_slices(
+            harmonic_field_max_n_pitches, harmonic_field_minimal_harmonicity
+        )
 
-        return transcription
+        rhythmic_orientation_indices = self._detect_rhythmic_orientation(
+            temperature=ro_temperature, density=ro_density
+        )
+        return self.bread, rhythmic_orientation_indices
 
     @staticmethod
     def _attach_double_barlines(staff, double_barlines_positions: tuple) -> None:
@@ -470,8 +585,167 @@ class VerseMaker(mus.SegmentMaker):
         verse.verse = self.verse
         return verse
 
+    def _get_stage_attributes(self, stage: str) -> tuple:
+        if stage == "tracks":
+            other_attributes = set(
+                itertools.chain.from_iterable(self._stage2attributes.values())
+            )
+            return tuple(
+                attribute
+                for attribute in self.__dict__
+                if attribute not in other_attributes and attribute != "_shared_stages"
+            )
+
+        return self._stage2attributes[stage]
+
+    def _make_stages_writable(self, *stages: str) -> None:
+        """Duplicate results of stages that are still shared with other copies."""
+        shared_stages = getattr(self, "_shared_stages", frozenset([]))
+        for stage in stages:
+            if stage in shared_stages:
+                for attribute in self._get_stage_attributes(stage):
+                    setattr(self, attribute, copy.deepcopy(getattr(self, attribute)))
+
+                # stages that are saved in the same attributes aren't shared anymore
+                shared_stages = frozenset(
+                    shared_stage
+                    for shared_stage in shared_stages
+                    if not set(self._get_stage_attributes(shared_stage)).intersection(
+                        self._get_stage_attributes(stage)
+                    )
+                )
+
+        self._shared_stages = shared_stages
+
     def copy(self) -> "VerseMaker":
-        return copy.deepcopy(self)
+        """Return copy that shares the results of all analysis stages.
+
+        Only the tracks (the attached trackmakers and the state of the segment maker)
+        get duplicated. The results of all other stages are shared until one of the
+        copies changes them.
+        """
+        shared_stages = frozenset(stage for stage in self.stages if stage != "tracks")
+        shared_values = tuple(
+            getattr(self, attribute)
+            for stage in shared_stages
+            for attribute in self._get_stage_attributes(stage)
+        )
+
+        new = copy.copy(self)
+        memo = {id(self): new}
+        memo.update({id(value): value for value in shared_values})
+        for attribute in self._get_stage_attributes("tracks"):
+            setattr(new, attribute, copy.deepcopy(getattr(self, attribute), memo))
+
+        self._shared_stages = shared_stages
+        new._shared_stages = shared_stages
+        return new
+
+    # removing areas of a SegmentMaker may change any of its attributes
+    def remove_area(self, *args, **kwargs) -> None:
+        self._make_stages_writable(*self.stages)
+        super().remove_area(*args, **kwargs)
+
+    def force_remove_area(self, *args, **kwargs) -> None:
+        self._make_stages_writable(*self.stages)
+        super().force_remove_area(*args, **kwargs)
+
+    @staticmethod
+    def _get_stage_path(stage: str, directory: str) -> str:
+        return "{}/{}.pickle".format(directory, stage)
+
+    def _get_stage_output(self, stage: str) -> dict:
+        if stage in self._stage2slice_attributes:
+            attributes = tuple(
+                attribute for attribute, _ in self._stage2slice_attributes[stage]
+            )
+            return {
+                "slices": tuple(
+                    tuple(getattr(slice_, attribute) for attribute in attributes)
+                    for slice_ in self.bread
+                )
+            }
+
+        output = {
+            attribute: getattr(self, attribute)
+            for attribute in self._get_stage_attributes(stage)
+        }
+
+        # the saved bread only contains the results of the bread stage
+        if stage == "bread":
+            bread = copy.deepcopy(self.bread)
+            for slice_ in bread:
+                for slice_attributes in self._stage2slice_attributes.values():
+                    for attribute, default_value in slice_attributes:
+                        setattr(slice_, attribute, default_value)
+            output.update({"bread": bread})
+
+        return output
+
+    def save_stage(self, stage: str, directory: str) -> str:
+        """Save results of a stage in directory and return the path of the file.
+
+        Stages that work on the bread (harmonic pitches and harmonic fields) only save
+        the slice attributes that they assign. The tracks can't be saved.
+        """
+        if stage not in self.checkpoint_stages:
+            raise ValueError("Stage '{}' can't be saved.".format(stage))
+
+        path = self._get_stage_path(stage, directory)
+        caching.atomic_write(
+            path,
+            pickle.dumps(
+                self._get_stage_output(stage), protocol=pickle.HIGHEST_PROTOCOL
+            ),
+        )
+        return path
+
+    def has_saved_stage(self, stage: str, directory: str) -> bool:
+        return os.path.isfile(self._get_stage_path(stage, directory))
+
+    def load_stage(self, stage: str, directory: str) -> None:
+        """Resume results of a stage that have been saved with 'save_stage'."""
+        with open(self._get_stage_path(stage, directory), "rb") as f:
+            output = pickle.load(f)
+
+        self._make_stages_writable(stage)
+
+        if stage in self._stage2slice_attributes:
+            if len(output["slices"]) != len(self.bread):
+                raise ValueError(
+                    "Saved stage '{}' doesn't fit to the current bread.".format(stage)
+                )
+
+            attributes = tuple(
+                attribute for attribute, _ in self._stage2slice_attributes[stage]
+            )
+            for slice_, values in zip(self.bread, output["slices"]):
+                for attribute, value in zip(attributes, values):
+                    setattr(slice_, attribute, value)
+
+        else:
+            for attribute, value in output.items():
+                setattr(self, attribute, value)
+
+    def save_checkpoint(self, directory: str) -> None:
+        """Save all stages except of the tracks."""
+        for stage in self.checkpoint_stages:
+            self.save_stage(stage, directory)
+
+    def load_checkpoint(self, directory: str) -> tuple:
+        """Resume all saved stages and return their names.
+
+        Stages are loaded in the order of the pipeline until the first stage that
+        hasn't been saved, because all later stages depend on it. The tracks are never
+        loaded: trackmakers have to be attached again after loading a checkpoint.
+        """
+        loaded_stages = []
+        for stage in self.checkpoint_stages:
+            if not self.has_saved_stage(stage, directory):
+                break
+            self.load_stage(stage, directory)
+            loaded_stages.append(stage)
+        return tuple(loaded_stages)
 
     @property
     def musdat(self) -> dict:
@@ -876,6 +1150,7 @@ class VerseMaker(mus.SegmentMaker):
         tonality_flux_maximum_octave_difference: tuple = (1, 1),
         harmonic_pitch_maximum_octave_difference: tuple = (1, 1),
     ) -> None:
+        self._make_stages_writable("harmonic_pitches")
 
         if add_artifical_harmonics and add_normal_pitches:
             get_available_pitches_from_adapted_instrument = None
@@ -896,29 +1171,33 @@ class VerseMaker(mus.SegmentMaker):
                 slice1.melody_pitch,
             )
             if all(tests):
-                p0, p1 = (
-                    slice0.melody_pitch.normalize(),
-                    slice1.melody_pitch.normalize(),
+                id0, id1 = (
+                    pitch_registry.REGISTRY.get_normalized_id(slice0.melody_pitch),
+                    pitch_registry.REGISTRY.get_normalized_id(slice1.melody_pitch),
                 )
+                p0, p1 = pitch_registry.REGISTRY.get_pitches((id0, id1))
 
                 sd0, sd1 = (
-                    globals_.PITCH2SCALE_DEGREE[p0],
-                    globals_.PITCH2SCALE_DEGREE[p1],
+                    pitch_registry.REGISTRY.get_property("scale_degree", id0),
+                    pitch_registry.REGISTRY.get_property("scale_degree", id1),
                 )
 
                 available_pitches_per_tone = tuple(
                     tuple(
-                        sp.normalize()
+                        pitch_registry.REGISTRY.normalize(sp)
                         for sp in functools.reduce(
                             operator.add,
                             tuple(
                                 globals_.SCALE_PER_INSTRUMENT[instr]
                                 for instr in ("cello", "violin", "viola")
-                                if instr != globals_.PITCH2INSTRUMENT[p]
+                                if instr
+                                != pitch_registry.REGISTRY.get_property(
+                                    "instrument", id_
+                                )
                             ),
                         )
                     )
-                    for p in (p0, p1)
+                    for id_ in (id0, id1)
                 )
 
                 # tonality flux
@@ -955,9 +1234,53 @@ class VerseMaker(mus.SegmentMaker):
 
     @staticmethod
     def _get_harmonicity_of_harmony(harmony: tuple) -> float:
+        ids = tuple(pitch_registry.REGISTRY.get_normalized_id(p) for p in harmony)
         return sum(
-            globals_.HARMONICITY_NET[tuple(sorted(c))]
-            for c in itertools.combinations(harmony, 2)
+            float(globals_.HARMONICITY_MATRIX[id0, id1])
+            for id0, id1 in itertools.combinations(ids, 2)
+        )
+
+    @staticmethod
+    def _get_fitness_per_pitch(harmonicities: np.ndarray, ids: np.ndarray) -> tuple:
+        """Return average harmonicity of each pitch to all other pitches of a harmony.
+
+        'harmonicities' has the shape (n_harmonies, n_pitches, n_pitches), 'ids' the
+        shape (n_harmonies, n_pitches). Values are summed in the same order as
+        summing them with the builtin 'sum' function would do.
+        """
+        n_pitches = ids.shape[1]
+        div = max((n_pitches - 1, 1))
+        fitness_per_pitch = []
+        for idx0 in range(n_pitches):
+            fitness = 0
+            for idx1 in range(n_pitches):
+                fitness = fitness + np.where(
+                    ids[:, idx0] != ids[:, idx1], harmonicities[:, idx0, idx1], 0
+                )
+            fitness_per_pitch.append(fitness / div)
+        return tuple(fitness_per_pitch)
+
+    @staticmethod
+    def _make_harmonic_field_candidate_ids(
+        hf_ids: tuple, available_ids_per_scale_degree: list, combinations: tuple
+    ) -> np.ndarray:
+        """Return array with the ids of the pitches of all candidates (one per row).
+
+        The first columns contain the pitches of the slice, the other columns the
+        added pitches, in the same order as itertools.product would return them.
+        """
+        added_ids = []
+        for combination in combinations:
+            available_ids = tuple(
+                available_ids_per_scale_degree[sd] for sd in combination
+            )
+            grid = np.meshgrid(*available_ids, indexing="ij")
+            added_ids.append(np.stack([axis.ravel() for axis in grid], axis=1))
+
+        added_ids = np.concatenate(added_ids)
+        return np.concatenate(
+            (np.tile(np.array(hf_ids, dtype=int), (len(added_ids), 1)), added_ids),
+            axis=1,
         )
 
     def _find_harmonic_field_candidates(
@@ -967,17 +1290,23 @@ class VerseMaker(mus.SegmentMaker):
         max_n_pitches: int,
         minimal_harmonicity_for_pitch: float,
     ) -> tuple:
-        hf = tuple(
-            p.normalize() for p in (slice_.melody_pitch, slice_.harmonic_pitch) if p
+        # pitches are handled by the ids of their normalized versions, which are the
+        # indices of the harmonicity matrix
+        registry = pitch_registry.REGISTRY
+        hf_ids = tuple(
+            registry.get_normalized_id(p)
+            for p in (slice_.melody_pitch, slice_.harmonic_pitch)
+            if p
         )
+        hf = registry.get_pitches(hf_ids)
 
         if hf:
-            available_pitches_per_scale_degree = [
-                tuple(into.normalize() for into in intonations)
+            available_ids_per_scale_degree = [
+                tuple(registry.get_normalized_id(into) for into in intonations)
                 for intonations in globals_.INTONATIONS_PER_SCALE_DEGREE
             ]
             prohibited_scale_degrees_for_added_pitches = set(
-                globals_.PITCH2SCALE_DEGREE[p] for p in hf
+                registry.get_property("scale_degree", id_) for id_ in hf_ids
             )
 
             try:
@@ -992,34 +1321,33 @@ class VerseMaker(mus.SegmentMaker):
 
             if next_slice and next_slice.melody_pitch:
                 prohibited_scale_degrees_for_added_pitches.add(
-                    globals_.PITCH2SCALE_DEGREE[next_slice.melody_pitch.normalize()]
+                    registry.get_scale_degree(next_slice.melody_pitch)
                 )
 
             for neighbour in (s for s in (previous_slice, next_slice) if s):
                 if neighbour:
                     neighbour_pitches = (
-                        np.normalize()
-                        for np in (neighbour.melody_pitch, neighbour.harmonic_pitch)
-                        if np
+                        neighbour_pitch
+                        for neighbour_pitch in (
+                            neighbour.melody_pitch,
+                            neighbour.harmonic_pitch,
+                        )
+                        if neighbour_pitch
                     )
-                    for np in neighbour_pitches:
-                        available_pitches_per_scale_degree[
-                            globals_.PITCH2SCALE_DEGREE[np]
-                        ] = tuple(
-                            p
-                            for p in available_pitches_per_scale_degree[
-                                globals_.PITCH2SCALE_DEGREE[np]
-                            ]
-                            if p == np
+                    for neighbour_pitch in neighbour_pitches:
+                        neighbour_id = registry.get_normalized_id(neighbour_pitch)
+                        sd = registry.get_property("scale_degree", neighbour_id)
+                        available_ids_per_scale_degree[sd] = tuple(
+                            id_
+                            for id_ in available_ids_per_scale_degree[sd]
+                            if id_ == neighbour_id
                         )
 
             allowed_scale_degrees = tuple(
                 sd
-                for sd, available_intonations in enumerate(
-                    available_pitches_per_scale_degree
-                )
+                for sd, available_ids in enumerate(available_ids_per_scale_degree)
                 if sd not in prohibited_scale_degrees_for_added_pitches
-                and available_intonations
+                and available_ids
             )
 
             n_missing_pitches = max_n_pitches - len(hf)
@@ -1027,75 +1355,154 @@ class VerseMaker(mus.SegmentMaker):
             n_items = min((n_missing_pitches, len(allowed_scale_degrees)))
 
             if n_items > 0:
-                candidates = []
+                # all candidates are scored at once with the dense harmonicity matrix
+                ids = self._make_harmonic_field_candidate_ids(
+                    hf_ids,
+                    available_ids_per_scale_degree,
+                    tuple(itertools.combinations(allowed_scale_degrees, n_items)),
+                )
+                harmonicities = globals_.HARMONICITY_MATRIX[
+                    ids[:, :, np.newaxis], ids[:, np.newaxis, :]
+                ]
 
-                for combination in itertools.combinations(
-                    allowed_scale_degrees, n_items
-                ):
-                    combination = tuple(
-                        available_pitches_per_scale_degree[idx] for idx in combination
+                # discard added pitches if their harmonicity value is too low
+                is_kept = np.ones(ids.shape, dtype=bool)
+                if minimal_harmonicity_for_pitch:
+                    for nth_pitch, fitness in enumerate(
+                        self._get_fitness_per_pitch(harmonicities, ids)[len(hf) :],
+                        len(hf),
+                    ):
+                        is_kept[:, nth_pitch] = fitness > minimal_harmonicity_for_pitch
+
+                harmonicity_per_candidate = 0
+                for idx0, idx1 in itertools.combinations(range(ids.shape[1]), 2):
+                    harmonicity_per_candidate = harmonicity_per_candidate + np.where(
+                        is_kept[:, idx0] & is_kept[:, idx1],
+                        harmonicities[:, idx0, idx1],
+                        0,
                     )
-                    for added_pitches in itertools.product(*combination):
-                        nhf = hf + tuple(added_pitches)
-
-                        # discard added pitches if their harmonicity value is too low
-
-                        if minimal_harmonicity_for_pitch:
-                            div = len(nhf) - 1
-                            pitch2fitnenss = {
-                                p: sum(
-                                    globals_.HARMONICITY_NET[tuple(sorted((p, p1)))]
-                                    for p1 in nhf
-                                    if p != p1
-                                )
-                                / div
-                                for p in nhf
-                            }
-
-                            nhf = tuple(
-                                p
-                                for p in nhf
-                                if p in hf
-                                or pitch2fitnenss[p] > minimal_harmonicity_for_pitch
-                            )
 
-                        harmonicity = self._get_harmonicity_of_harmony(nhf)
+                scale_degrees_per_candidate = registry.get_array("scale_degree")[
+                    ids[:, len(hf) :]
+                ]
+
+                # stable sort keeps the order of candidates with equal harmonicity
+                candidates = []
+                for candidate_idx in np.argsort(
+                    -harmonicity_per_candidate, kind="stable"
+                ).tolist():
+                    candidate_ids = ids[candidate_idx].tolist()
+                    nhf = tuple(
+                        registry.get_pitch(id_)
+                        for id_, is_kept_pitch in zip(
+                            candidate_ids, is_kept[candidate_idx].tolist()
+                        )
+                        if is_kept_pitch
+                    )
 
-                        # only check for added pitches
-                        scale_degree2pitch = {
-                            globals_.PITCH2SCALE_DEGREE[p]: p
-                            for p in tuple(added_pitches)
-                        }
+                    # only check for added pitches
+                    scale_degree2pitch = {
+                        sd: registry.get_pitch(id_)
+                        for sd, id_ in zip(
+                            scale_degrees_per_candidate[candidate_idx].tolist(),
+                            candidate_ids[len(hf) :],
+                        )
+                    }
 
-                        candidates.append((nhf, harmonicity, scale_degree2pitch))
+                    candidates.append(
+                        (
+                            nhf,
+                            float(harmonicity_per_candidate[candidate_idx]),
+                            scale_degree2pitch,
+                        )
+                    )
 
-                return tuple(
-                    sorted(candidates, key=operator.itemgetter(1), reverse=True)
-                )
+                return tuple(candidates)
 
             return ((hf, self._get_harmonicity_of_harmony(hf), {}),)
 
     @staticmethod
-    def _find_harmonic_fields(candidates_per_slice: tuple) -> tuple:
-        def test_for_tonality_flux(choosen_candidates: tuple) -> bool:
-            for candidate0, candidate1 in zip(
-                choosen_candidates, choosen_candidates[1:]
-            ):
-                scale_degree2pitch0, scale_degree2pitch1 = candidate0[2], candidate1[2]
-                for sd in scale_degree2pitch0:
-                    if sd in scale_degree2pitch1:
-                        if scale_degree2pitch0[sd] != scale_degree2pitch1[sd]:
-                            return False
-
-            return True
-
-        return tools.complex_backtracking(
-            candidates_per_slice, (test_for_tonality_flux,)
+    def _are_harmonic_field_candidates_compatible(
+        candidate0: tuple, candidate1: tuple
+    ) -> bool:
+        # neighbouring slices mustn't use different intonations for the same scale
+        # degree (no tonality flux)
+        scale_degree2pitch1 = candidate1[2]
+        return all(
+            scale_degree2pitch1.get(sd, pitch) == pitch
+            for sd, pitch in candidate0[2].items()
         )
 
+    @classmethod
+    def _find_harmonic_fields(
+        cls, candidates_per_slice: tuple, beam_width: int = None
+    ) -> tuple:
+        """Return one candidate per slice without any tonality flux.
+
+        The solution is the same one a depth-first backtracking over the (sorted)
+        candidates would return: for each slice the best candidate that is compatible
+        with its predecessor and that can still be continued until the last slice.
+        Whether a candidate can be continued gets calculated in one backward pass, so
+        that the time is linear in the number of slices.
+
+        If 'beam_width' is set, only the 'beam_width' best candidates of each slice are
+        taken into account. If they don't contain any solution, all candidates are
+        used.
+        """
+        if beam_width is not None:
+            try:
+                return cls._find_harmonic_fields(
+                    tuple(
+                        candidates[:beam_width] for candidates in candidates_per_slice
+                    )
+                )
+            except ValueError:
+                pass
+
+        # backward pass: find all candidates that can be continued until the last slice
+        continuable_candidates_per_slice = [candidates_per_slice[-1]]
+        for candidates in reversed(candidates_per_slice[:-1]):
+            next_candidates = continuable_candidates_per_slice[0]
+            continuable_candidates_per_slice.insert(
+                0,
+                tuple(
+                    candidate
+                    for candidate in candidates
+                    if any(
+                        cls._are_harmonic_field_candidates_compatible(
+                            candidate, next_candidate
+                        )
+                        for next_candidate in next_candidates
+                    )
+                ),
+            )
+
+        if not continuable_candidates_per_slice[0]:
+            raise ValueError("No harmonic fields without tonality flux found.")
+
+        # forward pass: choose the best continuable candidate for each slice
+        solution = [continuable_candidates_per_slice[0][0]]
+        for candidates in continuable_candidates_per_slice[1:]:
+            solution.append(
+                next(
+                    candidate
+                    for candidate in candidates
+                    if cls._are_harmonic_field_candidates_compatible(
+                        solution[-1], candidate
+                    )
+                )
+            )
+
+        return tuple(solution)
+
     def assign_harmonic_fields_to_slices(
-        self, max_n_pitches: int = 4, minimal_harmonicity_for_pitch: float = None
+        self,
+        max_n_pitches: int = 4,
+        minimal_harmonicity_for_pitch: float = None,
+        beam_width: int = None,
     ) -> None:
+        self._make_stages_writable("harmonic_fields")
+
         candidates_per_slice = []
         for idx, slice_ in enumerate(self.bread):
             candidates_per_slice.append(
@@ -1109,21 +1516,24 @@ class VerseMaker(mus.SegmentMaker):
         for candidates in candidates2analyse:
             can = candidates[:-1]
             if can:
-                for solution in self._find_harmonic_fields(can):
+                for solution in self._find_harmonic_fields(can, beam_width):
                     pitches = solution[0]
                     div_fitness = len(pitches) - 1
 
                     if div_fitness == 0:
                         div_fitness = 1
 
+                    ids = tuple(
+                        pitch_registry.REGISTRY.get_normalized_id(p) for p in pitches
+                    )
                     pitch2fitnenss = {
                         p: sum(
-                            globals_.HARMONICITY_NET[tuple(sorted((p, p1)))]
-                            for p1 in pitches
+                            float(globals_.HARMONICITY_MATRIX[id0, id1])
+                            for p1, id1 in zip(pitches, ids)
                             if p != p1
                         )
                         / div_fitness
-                        for p in pitches
+                        for p, id0 in zip(pitches, ids)
                     }
                     harmonic_field_per_slice.append(pitch2fitnenss)
             if candidates[-1] is None:
@@ -1142,7 +1552,7 @@ class VerseMaker(mus.SegmentMaker):
                 markup = None
             else:
                 instrument = globals_.INSTRUMENT_NAME2OBJECT[
-                    globals_.PITCH2INSTRUMENT[tone.pitch.normalize()]
+                    pitch_registry.REGISTRY.get_instrument(tone.pitch)
                 ]
                 pitch = [tone.pitch]
                 markup = attachments.MarkupOnOff(
@@ -1205,6 +1615,8 @@ class VerseMaker(mus.SegmentMaker):
     ) -> tuple:
         """Return indices of beats that are part of rhythmic orientation."""
 
+        registry = pitch_registry.REGISTRY
+
         for percent in (density, temperature):
             assert percent >= 0 and percent <= 1
 
@@ -1233,9 +1645,9 @@ class VerseMaker(mus.SegmentMaker):
                     for p in slice_.harmonic_field
                     # only use pitches that are available in the instrument that are
                     # allowed to play during this beat
-                    if globals_.PITCH2INSTRUMENT[p] in available_instruments
+                    if registry.get_instrument(p) in available_instruments
                     # prohibit auxiliary pitches for rhythmic orientation
-                    and globals_.PITCH2SCALE_DEGREE[p] not in (3, 6)
+                    and registry.get_scale_degree(p) not in (3, 6)
                 )
 
                 if available_pitches:
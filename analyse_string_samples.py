@@ -0,0 +1,14 @@
+if __name__ == "__main__":
+    import argparse
+    import os
+
+    from aml.trackmaker import strings
+
+    parser = argparse.ArgumentParser(
+        description="Update the index of the string samples and analyse new samples."
+    )
+    parser.add_argument("--jobs", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    samples = strings.SampleBasedStringSoundEngine.load_samples(jobs=args.jobs)
+    print("Indexed {} samples.".format(len(samples)))
@@ -0,0 +1,4 @@
+if __name__ == "__main__":
+    from aml.trackmaker import keyboard
+
+    keyboard.generate_keyboard_mapping_files()
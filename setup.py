@@ -18,6 +18,7 @@ setup(
         "aml.transcriptions",
         "aml.versmaker",
         "aml.trackmaker",
+        "aml.bench",
         "aml.transcriptions",
         # "aml.fragments",
         # "aml.parts",
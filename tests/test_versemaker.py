@@ -0,0 +1,59 @@
+"""Tests for the checkpoints of aml.versemaker.VerseMaker."""
+
+import os
+import pickle
+import tempfile
+import unittest
+
+from aml import globals_
+from aml import versemaker
+
+from aml.trackmaker import keyboard
+from aml.trackmaker import strings
+
+
+def _attach_trackmakers(verse_maker: versemaker.VerseMaker) -> None:
+    verse_maker.attach(
+        violin=strings.SimpleStringMaker(globals_.VIOLIN),
+        viola=strings.SimpleStringMaker(globals_.VIOLA),
+        cello=strings.SimpleStringMaker(globals_.CELLO),
+        keyboard=keyboard.KeyboardMaker(),
+    )
+
+
+class VerseMakerCheckpointTest(unittest.TestCase):
+    def setUp(self):
+        self.verse_maker = versemaker.VerseMaker(59, "opening")
+        # changes the results of all stages, so that they differ from a new maker
+        self.verse_maker.remove_area(0, 1)
+        _attach_trackmakers(self.verse_maker)
+
+    def test_checkpoint_round_trip(self):
+        resumed_verse_maker = versemaker.VerseMaker(59, "opening")
+
+        with tempfile.TemporaryDirectory() as directory:
+            self.verse_maker.save_checkpoint(directory)
+            self.assertFalse(os.path.exists("{}/tracks.pickle".format(directory)))
+            self.assertEqual(
+                resumed_verse_maker.load_checkpoint(directory),
+                versemaker.VerseMaker.checkpoint_stages,
+            )
+
+        for stage in versemaker.VerseMaker.checkpoint_stages:
+            self.assertEqual(
+                pickle.dumps(self.verse_maker._get_stage_output(stage)),
+                pickle.dumps(resumed_verse_maker._get_stage_output(stage)),
+            )
+
+        # the tracks are built again from the resumed stages
+        _attach_trackmakers(resumed_verse_maker)
+        self.assertIsInstance(resumed_verse_maker(), versemaker.Verse)
+
+    def test_tracks_are_not_saved(self):
+        with tempfile.TemporaryDirectory() as directory:
+            with self.assertRaises(ValueError):
+                self.verse_maker.save_stage("tracks", directory)
+
+
+if __name__ == "__main__":
+    unittest.main()